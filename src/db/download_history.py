@@ -2,9 +2,33 @@ import sqlite3
 import os
 import time
 import logging
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 
+# 每个线程缓存一个数据库实例，避免重复打开连接
+_tls = threading.local()
+
+# 进程内所有写事务共用的写锁，写操作在Python层排队，避免SQLite返回BUSY
+DB_WRITE_LOCK = threading.RLock()
+
+
+def get_db():
+    """获取当前线程缓存的数据库实例
+    
+    首次调用时创建实例，之后在同一线程内复用同一个SQLite连接。
+    
+    Returns:
+        DownloadHistoryDB: 当前线程的数据库实例
+    """
+    db = getattr(_tls, 'db', None)
+    if db is None:
+        db = DownloadHistoryDB()
+        _tls.db = db
+    return db
+
+
 class DownloadHistoryDB:
     """下载历史记录数据库管理类"""
     
@@ -24,11 +48,71 @@ class DownloadHistoryDB:
             db_path = data_dir / "download_history.db"
         
         self.db_path = str(db_path)
+        self._conn = None
+        self._batch_depth = 0  # 嵌套批量事务层数
         self._create_tables()
     
+    def _get_connection(self):
+        """获取缓存的SQLite连接，首次调用时打开"""
+        if self._conn is None:
+            # 允许跨线程使用（例如在UI线程中取消下载时更新状态）
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 其它进程持有写锁时阻塞等待，而不是立即失败
+            conn.execute("PRAGMA busy_timeout=5000")
+            # WAL模式下NORMAL只在检查点时fsync，下载历史可以接受这种持久性
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # 页缓存约20MB（负数表示KiB）
+            conn.execute("PRAGMA cache_size=-20000")
+            # 排序等临时数据放在内存中
+            conn.execute("PRAGMA temp_store=MEMORY")
+            self._conn = conn
+        return self._conn
+    
+    @contextmanager
+    def _connection(self, write=False):
+        """以事务方式使用缓存连接，退出时自动提交或回滚
+        
+        处于batch()中时不单独提交，由外层批量事务统一提交。
+        
+        Args:
+            write: 是否为写操作，写操作在DB_WRITE_LOCK内执行
+        """
+        conn = self._get_connection()
+        if self._batch_depth:
+            yield conn
+            return
+        if write:
+            with DB_WRITE_LOCK, conn:
+                yield conn
+        else:
+            with conn:
+                yield conn
+    
+    @contextmanager
+    def batch(self):
+        """将多次写操作合并到同一个事务中，退出时只提交一次"""
+        conn = self._get_connection()
+        self._batch_depth += 1
+        try:
+            if self._batch_depth > 1:
+                yield self
+            else:
+                with DB_WRITE_LOCK, conn:
+                    yield self
+        finally:
+            self._batch_depth -= 1
+    
+    def close(self):
+        """关闭数据库连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
     def _create_tables(self):
         """创建必要的表结构"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection(write=True) as conn:
             cursor = conn.cursor()
             
             # 检查表是否存在
@@ -70,7 +154,11 @@ class DownloadHistoryDB:
                     except sqlite3.OperationalError as e:
                         logging.error(f"添加subtitle_path列时出错: {e}")
             
-            conn.commit()
+            # 按状态过滤并按时间排序的查询使用的复合索引
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_download_history_status_time
+            ON download_history (status, start_time DESC)
+            ''')
     
     def add_download(self, video_id, title, url, thumbnail_url=None, 
                     video_format=None, audio_format=None, subtitles=None,
@@ -90,7 +178,7 @@ class DownloadHistoryDB:
         Returns:
             int: 新记录的ID
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection(write=True) as conn:
             cursor = conn.cursor()
             
             # 将字幕列表转换为字符串
@@ -110,12 +198,11 @@ class DownloadHistoryDB:
             ''', (video_id, title, url, thumbnail_url, video_format, audio_format, 
                   subtitles_str, None, output_path, '进行中', current_time))
             
-            conn.commit()
             return cursor.lastrowid
     
     def update_download_status(self, record_id, status, output_path=None, 
-                              file_size=None, error_message=None):
-        """更新下载状态
+                              file_size=None, error_message=None, subtitle_path=None):
+        """更新下载状态，所有字段在同一条UPDATE语句中写入
         
         Args:
             record_id: 记录ID
@@ -123,8 +210,9 @@ class DownloadHistoryDB:
             output_path: 输出文件路径
             file_size: 文件大小（字节）
             error_message: 错误信息（如果有）
+            subtitle_path: 字幕文件路径（如果有）
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection(write=True) as conn:
             cursor = conn.cursor()
             
             # 获取当前时间戳
@@ -149,25 +237,32 @@ class DownloadHistoryDB:
             if error_message:
                 query += ", error_message = ?"
                 params.append(error_message)
+            
+            if subtitle_path:
+                query += ", subtitle_path = ?"
+                params.append(subtitle_path)
                 
             query += " WHERE id = ?"
             params.append(record_id)
             
             cursor.execute(query, params)
-            conn.commit()
     
     def update_conversion_status(self, file_path, status, error_message=None, record_id=None):
         """根据记录ID更新转换状态
         
         Args:
             file_path: 文件路径（webm或mp4）
-            status: 新状态（转换完成 或 转换中断）
+            status: 新状态（完成 或 转换中断），"转换完成"按"完成"处理
             error_message: 错误信息（如果有）
             record_id: 记录ID，必须提供
             
         Returns:
             bool: 是否找到并更新了记录
         """
+        # 转换成功的记录与下载完成的记录使用同一状态，过滤、统计和颜色显示都依赖它
+        if status == "转换完成":
+            status = "完成"
+        
         # 文件路径可能是.webm或.mp4格式，需要处理两种情况
         webm_path = file_path
         mp4_path = file_path.replace('.webm', '.mp4')
@@ -175,7 +270,7 @@ class DownloadHistoryDB:
         if webm_path.endswith('.mp4'):
             webm_path = file_path.replace('.mp4', '.webm')
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection(write=True) as conn:
             cursor = conn.cursor()
             
             # 必须提供record_id
@@ -232,7 +327,6 @@ class DownloadHistoryDB:
             params.append(record_id)
             
             cursor.execute(query, params)
-            conn.commit()
             return True
     
     def update_subtitle_path(self, record_id, subtitle_path):
@@ -248,7 +342,7 @@ class DownloadHistoryDB:
         if not record_id or not subtitle_path:
             return False
             
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection(write=True) as conn:
             cursor = conn.cursor()
             
             # 更新字幕路径
@@ -270,18 +364,8 @@ class DownloadHistoryDB:
         Returns:
             list: 下载记录列表
         """
-        with sqlite3.connect(self.db_path) as conn:
-            # 配置连接以返回字典
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            SELECT * FROM download_history
-            ORDER BY start_time DESC
-            LIMIT ? OFFSET ?
-            ''', (limit, offset))
-            
-            return [dict(row) for row in cursor.fetchall()]
+        with self._connection() as conn:
+            return self._query_downloads(conn.cursor(), None, limit, offset)
     
     def get_download_by_id(self, record_id):
         """根据ID获取下载记录
@@ -292,8 +376,7 @@ class DownloadHistoryDB:
         Returns:
             dict: 下载记录或None
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -313,7 +396,7 @@ class DownloadHistoryDB:
         Returns:
             bool: 是否成功删除
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection(write=True) as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -321,21 +404,43 @@ class DownloadHistoryDB:
             WHERE id = ?
             ''', (record_id,))
             
-            conn.commit()
             return cursor.rowcount > 0
     
+    def delete_downloads(self, record_ids):
+        """在一个事务中批量删除下载记录
+        
+        Args:
+            record_ids: 要删除的记录ID列表
+            
+        Returns:
+            int: 删除的记录数量
+        """
+        record_ids = list(record_ids)
+        if not record_ids:
+            return 0
+        
+        with self._connection(write=True) as conn:
+            cursor = conn.cursor()
+            
+            placeholders = ",".join("?" * len(record_ids))
+            cursor.execute(f'''
+            DELETE FROM download_history
+            WHERE id IN ({placeholders})
+            ''', record_ids)
+            
+            return cursor.rowcount
+    
     def delete_all_downloads(self):
         """清空所有下载记录
         
         Returns:
             int: 删除的记录数量
         """
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection(write=True) as conn:
             cursor = conn.cursor()
             
             cursor.execute("DELETE FROM download_history")
             
-            conn.commit()
             return cursor.rowcount
     
     def search_downloads(self, keyword, limit=100, offset=0):
@@ -349,20 +454,43 @@ class DownloadHistoryDB:
         Returns:
             list: 下载记录列表
         """
-        search_term = f"%{keyword}%"
+        with self._connection() as conn:
+            return self._query_downloads(conn.cursor(), keyword, limit, offset)
+    
+    def get_downloads(self, keyword=None, status=None, limit=100, offset=0, before=None):
+        """按搜索和状态条件分页获取下载记录
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        Args:
+            keyword: 搜索关键词，为空时返回全部记录
+            status: 只返回该状态的记录，为None时不过滤
+            limit: 结果数量限制
+            offset: 结果偏移量
+            before: 上一页最后一条记录的(start_time, id)，只返回排在它之后的记录。
+                按键值翻页时两页之间新插入的记录不会让下一页出现重复行
             
-            cursor.execute('''
-            SELECT * FROM download_history
-            WHERE title LIKE ? OR url LIKE ?
-            ORDER BY start_time DESC
-            LIMIT ? OFFSET ?
-            ''', (search_term, search_term, limit, offset))
+        Returns:
+            list: 下载记录列表
+        """
+        with self._connection() as conn:
+            return self._query_downloads(conn.cursor(), keyword, limit, offset, status, before)
+    
+    def get_downloads_with_stats(self, keyword=None, status=None, limit=100, offset=0):
+        """在同一个读事务中获取下载记录列表和统计数据
+        
+        Args:
+            keyword: 搜索关键词，为空时返回全部记录
+            status: 只返回该状态的记录，为None时不过滤
+            limit: 结果数量限制
+            offset: 结果偏移量
             
-            return [dict(row) for row in cursor.fetchall()]
+        Returns:
+            tuple: (下载记录列表, 统计数据字典)
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            records = self._query_downloads(cursor, keyword, limit, offset, status)
+            stats = self._query_stats(cursor)
+            return records, stats
     
     def get_download_stats(self):
         """获取下载统计数据
@@ -370,38 +498,75 @@ class DownloadHistoryDB:
         Returns:
             dict: 包含总下载数、成功数、失败数等统计信息
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # 总下载数
-            cursor.execute("SELECT COUNT(*) FROM download_history")
-            total = cursor.fetchone()[0]
-            
-            # 成功下载数
-            cursor.execute("SELECT COUNT(*) FROM download_history WHERE status = '完成'")
-            completed = cursor.fetchone()[0]
-            
-            # 失败下载数
-            cursor.execute("SELECT COUNT(*) FROM download_history WHERE status = '失败'")
-            failed = cursor.fetchone()[0]
-            
-            # 取消下载数
-            cursor.execute("SELECT COUNT(*) FROM download_history WHERE status = '已取消'")
-            cancelled = cursor.fetchone()[0]
-            
-            # 转换中断数
-            cursor.execute("SELECT COUNT(*) FROM download_history WHERE status = '转换中断'")
-            conversion_interrupted = cursor.fetchone()[0]
-            
-            # 总下载大小
-            cursor.execute("SELECT SUM(file_size) FROM download_history WHERE file_size > 0")
-            total_size = cursor.fetchone()[0] or 0
-            
-            return {
-                'total': total,
-                'completed': completed,
-                'failed': failed,
-                'cancelled': cancelled,
-                'conversion_interrupted': conversion_interrupted,
-                'total_size': total_size
-            } 
\ No newline at end of file
+        with self._connection() as conn:
+            return self._query_stats(conn.cursor())
+    
+    def get_state_fingerprint(self):
+        """获取数据库内容的变化标记，用于判断是否需要重新加载
+        
+        PRAGMA data_version在其它连接提交修改后变化，total_changes统计本连接修改的行数，
+        两者都不变说明数据没有变化。不扫描任何表，代价远小于一次完整查询；
+        按end_time等列做聚合无法发现同一秒内的多次修改和字幕路径等不改时间的修改。
+        
+        Returns:
+            tuple: (data_version, total_changes)，只应与同一线程中获取的值比较
+        """
+        with self._connection() as conn:
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            return data_version, conn.total_changes
+    
+    def _query_downloads(self, cursor, keyword, limit, offset, status=None, before=None):
+        """按开始时间倒序查询下载记录，开始时间相同时按ID倒序
+        
+        keyword不为空时按标题或URL模糊匹配，status不为None时只返回该状态的记录，
+        before不为None时只返回排在(start_time, id)之后的记录。
+        """
+        conditions = []
+        params = []
+        
+        if before is not None:
+            before_time, before_id = before
+            conditions.append("(start_time < ? OR (start_time = ? AND id < ?))")
+            params.extend((before_time, before_time, before_id))
+        
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        
+        if keyword:
+            search_term = f"%{keyword}%"
+            conditions.append("(title LIKE ? OR url LIKE ?)")
+            params.extend((search_term, search_term))
+        
+        query = "SELECT * FROM download_history"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY start_time DESC, id DESC LIMIT ? OFFSET ?"
+        params.extend((limit, offset))
+        
+        # 直接迭代游标逐行转换，不先用fetchall()生成一份sqlite3.Row列表
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor]
+    
+    def _query_stats(self, cursor):
+        """用一次条件聚合查询统计各状态的记录数和总大小"""
+        cursor.execute('''
+        SELECT
+            COUNT(*),
+            SUM(CASE WHEN status = '完成' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = '失败' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = '已取消' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN status = '转换中断' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN file_size > 0 THEN file_size ELSE 0 END)
+        FROM download_history
+        ''')
+        total, completed, failed, cancelled, conversion_interrupted, total_size = cursor.fetchone()
+        
+        return {
+            'total': total,
+            'completed': completed or 0,
+            'failed': failed or 0,
+            'cancelled': cancelled or 0,
+            'conversion_interrupted': conversion_interrupted or 0,
+            'total_size': total_size or 0
+        } 
@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+import logging
+
+from src.db.download_history import get_db
+
+
+class DBWriter:
+    """后台数据库写入线程
+    
+    将下载/转换过程中的状态更新放入队列，由单独的线程按时间窗口批量写入，
+    同一批次内只提交一次事务，避免每次状态变化都触发一次SQLite提交。
+    """
+    
+    def __init__(self, flush_interval=0.2):
+        """初始化写入器
+        
+        Args:
+            flush_interval: 批量写入的时间窗口（秒）
+        """
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+    
+    def _ensure_started(self):
+        """首次使用时启动后台线程"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="DBWriter", daemon=True)
+                self._thread.start()
+    
+    def enqueue(self, fn_name, **kwargs):
+        """将一次数据库写操作加入队列
+        
+        Args:
+            fn_name: DownloadHistoryDB上的方法名，如 update_download_status
+            **kwargs: 传给该方法的参数
+        """
+        self._ensure_started()
+        self._queue.put((fn_name, kwargs))
+    
+    def flush(self, timeout=5.0):
+        """同步等待队列中已有的写操作全部完成
+        
+        Args:
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            bool: 是否在超时前完成
+        """
+        self._ensure_started()
+        done = threading.Event()
+        self._queue.put((None, done))
+        return done.wait(timeout)
+    
+    def _run(self):
+        """后台线程主循环：收集一个时间窗口内的写操作后批量提交"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            
+            # 收集时间窗口内的其它写操作，遇到flush请求时立即写入
+            while batch[-1][0] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._write_batch(batch)
+    
+    def _write_batch(self, batch):
+        """合并并写入一批操作，然后唤醒等待flush的调用方"""
+        pending = []
+        waiters = []
+        for fn_name, kwargs in batch:
+            if fn_name is None:
+                waiters.append(kwargs)
+                continue
+            
+            # 相邻的同一记录同类更新只保留合并后的最后一次，
+            # None表示不修改该字段，不能覆盖之前写入的值
+            key = (fn_name, kwargs.get('record_id'))
+            if pending and pending[-1][0] == key:
+                pending[-1][1].update((k, v) for k, v in kwargs.items() if v is not None)
+            else:
+                pending.append((key, dict(kwargs)))
+        
+        if pending:
+            try:
+                db = get_db()
+                with db.batch():
+                    for (fn_name, _), kwargs in pending:
+                        try:
+                            getattr(db, fn_name)(**kwargs)
+                        except Exception as e:
+                            logging.error(f"后台写入数据库失败 ({fn_name}): {str(e)}")
+            except Exception as e:
+                logging.error(f"批量提交数据库写操作失败: {str(e)}")
+        
+        for done in waiters:
+            done.set()
+
+
+# 全局共享的写入器实例
+db_writer = DBWriter()
@@ -8,6 +8,7 @@ import tempfile
 import shutil
 import signal
 import time
+import threading
 from src.config import DEFAULT_TIMEOUT, MAX_RETRIES, NETWORK_WAIT
 import sys
 from pathlib import Path
@@ -18,6 +19,19 @@ from src.config_manager import ConfigManager
 # 调整yt-dlp.exe的路径
 YTDLP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cmd", "yt-dlp.exe")
 
+# 解析yt-dlp输出的正则表达式，模块加载时编译一次
+PROGRESS_PATTERN = re.compile(r'\[download\]\s+(\d+\.\d+)%')
+ETA_PATTERN = re.compile(r'ETA\s+(\d+:\d+)')
+SPEED_PATTERN = re.compile(r'(\d+\.\d+\s*\w+/s)')
+MERGE_PATTERN = re.compile(r'\[Merger\]|正在合并|Merging')
+VIDEO_ID_PATTERN = re.compile(r'\[info\] (.*): Downloading')
+TITLE_PATTERN = re.compile(r'title:\s+(.*)')
+
+# 文件路径捕获模式
+DESTINATION_PATTERN = re.compile(r'Destination:\s+(.*)')  # 匹配 "Destination: 文件路径"
+DOWNLOAD_DEST_PATTERN = re.compile(r'\[download\]\s+Destination:\s+(.*)')  # 匹配 "[download] Destination: 文件路径"
+MERGED_INTO_PATTERN = re.compile(r'\[Merger\].*?into\s+"(.*?)"')  # 匹配 "[Merger] ... into "文件路径""
+
 class YtDownloader:
     def __init__(self, ytdlp_path: str = None, debug_callback: Callable[[str], None] = None, always_use_cookies: bool = True):
         """
@@ -32,7 +46,7 @@ class YtDownloader:
         if not os.path.exists(self.ytdlp_path):
             raise FileNotFoundError(f"找不到yt-dlp可执行文件: {self.ytdlp_path}")
         self.processes = []  # 存储所有进程对象
-        self.is_cancelled = False  # 取消标志
+        self.cancel_event = threading.Event()  # 取消标志，其它线程可直接检查或等待
         self.debug_callback = debug_callback  # 调试信息回调
         self.always_use_cookies = always_use_cookies  # 是否总是使用cookies
         self.config_manager = ConfigManager()  # 配置管理器
@@ -89,12 +103,17 @@ class YtDownloader:
             # 只使用logging记录日志，避免重复输出
             logging.info(formatted_message)
     
+    @property
+    def is_cancelled(self) -> bool:
+        """下载是否已被取消"""
+        return self.cancel_event.is_set()
+    
     def cancel_download(self):
         """
         取消正在进行的下载
         """
         self.debug("尝试取消下载...")
-        self.is_cancelled = True
+        self.cancel_event.set()
         
         # 终止下载进程
         if self.download_process and self.download_process.poll() is None:
@@ -108,11 +127,16 @@ class YtDownloader:
                     )
                 else:  # 类Unix系统
                     self.download_process.terminate()
-                    # 给进程一点时间来终止
-                    time.sleep(0.5)
-                    if self.download_process.poll() is None:
+                    # 等待进程终止，进程退出后立即返回
+                    try:
+                        self.download_process.wait(timeout=0.5)
+                    except subprocess.TimeoutExpired:
                         # 如果进程没有终止，强制杀死它
                         self.download_process.kill()
+                        try:
+                            self.download_process.wait(timeout=0.5)
+                        except subprocess.TimeoutExpired:
+                            pass
                 
                 self.debug("下载已取消")
             except Exception as e:
@@ -120,7 +144,20 @@ class YtDownloader:
         else:
             self.debug("没有正在进行的下载进程")
     
-    def get_video_info(self, url: str, use_cookies=False, browser=None) -> Dict[str, Any]:
+    def cancel_info_fetch(self):
+        """
+        终止正在获取视频信息或格式列表的yt-dlp进程，不影响正在进行的下载
+        """
+        for process in self.processes:
+            if process.poll() is None:
+                self.debug(f"终止获取信息进程 PID={process.pid}")
+                try:
+                    process.kill()
+                except OSError as e:
+                    self.debug(f"终止获取信息进程时发生错误: {str(e)}")
+        self.processes = [process for process in self.processes if process.poll() is None]
+    
+    def get_video_info(self, url: str, use_cookies=False, browser=None, cancel_event=None) -> Dict[str, Any]:
         """
         获取视频信息
         
@@ -128,6 +165,7 @@ class YtDownloader:
             url: YouTube视频URL
             use_cookies: 是否使用浏览器cookie
             browser: 浏览器类型（firefox、chrome等）
+            cancel_event: 取消标志，设置后不再重试，直接抛出异常
             
         Returns:
             视频信息字典
@@ -163,6 +201,9 @@ class YtDownloader:
         
         while retry_count <= max_tries:
             try:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise Exception("已取消获取视频信息")
+                
                 start_time = time.time()
                 self.debug(f"尝试次数 #{retry_count+1}")
                 
@@ -191,6 +232,9 @@ class YtDownloader:
                     stdout, stderr = process.communicate()
                     raise Exception(f"获取视频信息超时 (超过{timeout_seconds}秒)")
                 
+                if cancel_event is not None and cancel_event.is_set():
+                    raise Exception("已取消获取视频信息")
+                
                 if stderr:
                     self.debug(f"进程输出错误: {stderr}")
                 
@@ -302,7 +346,7 @@ class YtDownloader:
                 use_cookies = True
                 
             # 如果之前有下载任务被取消，重置状态
-            self.is_cancelled = False
+            self.cancel_event.clear()
             self.download_process = None
             downloaded_file_path = None
             subtitle_files = []  # 记录下载的字幕文件路径列表
@@ -506,17 +550,6 @@ class YtDownloader:
                 bufsize=1  # 使用行缓冲
             )
             
-            # 解析进度的正则表达式
-            progress_pattern = re.compile(r'\[download\]\s+(\d+\.\d+)%')
-            eta_pattern = re.compile(r'ETA\s+(\d+:\d+)')
-            speed_pattern = re.compile(r'(\d+\.\d+\s*\w+/s)')
-            merge_pattern = re.compile(r'\[Merger\]|正在合并|Merging')
-            
-            # 添加文件路径捕获模式
-            destination_pattern = re.compile(r'Destination:\s+(.*)')  # 匹配 "Destination: 文件路径"
-            download_dest_pattern = re.compile(r'\[download\]\s+Destination:\s+(.*)')  # 匹配 "[download] Destination: 文件路径"
-            merged_into_pattern = re.compile(r'\[Merger\].*?into\s+"(.*?)"')  # 匹配 "[Merger] ... into "文件路径""
-            
             # 上次进度更新值和时间
             last_percent = 0
             last_update_time = time.time()
@@ -542,7 +575,7 @@ class YtDownloader:
                 if "[info]" in line and "Downloading" in line and "format" not in line:
                     try:
                         # 尝试提取视频ID和标题
-                        match = re.search(r'\[info\] (.*): Downloading', line)
+                        match = VIDEO_ID_PATTERN.search(line)
                         if match:
                             video_id = match.group(1).strip()
                             self.debug(f"捕获到视频ID: {video_id}")
@@ -553,7 +586,7 @@ class YtDownloader:
                 if "[Metadata]" in line and "title:" in line:
                     try:
                         # 尝试提取视频标题
-                        match = re.search(r'title:\s+(.*)', line)
+                        match = TITLE_PATTERN.search(line)
                         if match:
                             video_title = match.group(1).strip()
                             self.debug(f"捕获到视频标题: {video_title}")
@@ -584,7 +617,7 @@ class YtDownloader:
                     self.debug(line)
                 
                 # 捕获下载目标路径
-                dest_match = destination_pattern.search(line)
+                dest_match = DESTINATION_PATTERN.search(line)
                 if dest_match:
                     potential_path = dest_match.group(1).strip()
                     # 不再重复输出相同的目标路径
@@ -593,7 +626,7 @@ class YtDownloader:
                         downloaded_file_path = potential_path
                 
                 # 捕获[download] Destination格式的路径
-                download_dest_match = download_dest_pattern.search(line)
+                download_dest_match = DOWNLOAD_DEST_PATTERN.search(line)
                 if download_dest_match:
                     potential_path = download_dest_match.group(1).strip()
                     # 不再重复输出相同的目标路径
@@ -602,7 +635,7 @@ class YtDownloader:
                         downloaded_file_path = potential_path
                 
                 # 捕获合并输出路径
-                merged_match = merged_into_pattern.search(line)
+                merged_match = MERGED_INTO_PATTERN.search(line)
                 if merged_match:
                     potential_path = merged_match.group(1).strip()
                     # 不再重复输出相同的目标路径
@@ -611,7 +644,7 @@ class YtDownloader:
                         downloaded_file_path = potential_path
                 
                 # 检查是否是下载进度信息
-                progress_match = progress_pattern.search(line)
+                progress_match = PROGRESS_PATTERN.search(line)
                 
                 if progress_match:
                     percent_str = progress_match.group(1)
@@ -626,12 +659,12 @@ class YtDownloader:
                             
                             # 提取ETA和速度
                             eta = "未知"
-                            eta_match = eta_pattern.search(line)
+                            eta_match = ETA_PATTERN.search(line)
                             if eta_match:
                                 eta = eta_match.group(1)
                                 
                             speed = "未知"
-                            speed_match = speed_pattern.search(line)
+                            speed_match = SPEED_PATTERN.search(line)
                             if speed_match:
                                 speed = speed_match.group(1)
                                 
@@ -647,7 +680,7 @@ class YtDownloader:
                         pass
                 
                 # 检查是否在合并
-                merge_match = merge_pattern.search(line)
+                merge_match = MERGE_PATTERN.search(line)
                 if merge_match and progress_callback:
                     progress_callback(95, "正在合并音视频...")
                     # 记录合并信息
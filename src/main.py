@@ -74,6 +74,7 @@ sys.path.append(parent_dir)
 from src.ui.main_window import MainWindow
 from src.config import APP_NAME, UI_THEME, YTDLP_PATH
 from src.config_manager import ConfigManager
+from src.db.writer import db_writer
 
 def configure_logging():
     """配置日志系统"""
@@ -131,6 +132,9 @@ def main():
     app = QApplication(sys.argv)
     app.setApplicationName(APP_NAME)
     
+    # 退出前写入后台写入线程中尚未提交的数据库更新
+    app.aboutToQuit.connect(db_writer.flush)
+    
     # 从配置中读取主题
     theme = config_manager.get("UI", "Theme", fallback=UI_THEME)
     app.setStyle(theme)  # 使用配置中的风格
@@ -1,44 +1,391 @@
-from PySide6.QtCore import QThread, Signal, QMetaObject
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, Signal, QMetaObject
+from PySide6.QtGui import QImage
 import os
+import re
+import stat
 import logging
+import math
 import time
 import threading
-import traceback
-from src.utils.video_utils import convert_webm_to_mp4
-import subprocess
+import weakref
+from src.utils.video_utils import convert_webm_to_mp4, terminate_process
+from src.utils.converter_pool import converter_pool, WAITING_MESSAGE
+from src.db.download_history import get_db
+from src.db.writer import db_writer
+from src.utils.thumbnail_cache import thumbnail_cache
 import json
-import re
-import glob
 from PySide6.QtCore import Qt
 
+# 转换进度信号的最小发送间隔（秒）
+PROGRESS_EMIT_INTERVAL = 0.1
+
+# 包含这些关键字的进度消息总是立即发送，不受节流限制
+_FORCE_EMIT_KEYWORDS = ("取消", "失败", "完成", "合并")
+
+# 从进度消息中提取百分比，例如 "转换中: 42.5%"
+_PERCENT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+_NUMBER_PATTERN = re.compile(r'\s*(\d+(?:\.\d+)?)\s*%?\s*')
+
+
+# 支持的字幕文件扩展名
+_SUBTITLE_EXTS = ('.srt', '.vtt', '.ass')
+
+# 字幕文件开头可能出现的标记（小写字节串）
+_SUBTITLE_MARKERS = (b'webvtt', b'srt', b'-->', b'[script info]')
+
+
+def _parse_percent(percent, message):
+    """把转换回调传来的百分比规整为0-100的整数
+    
+    常见情况下percent已经是数值，直接转换；否则再用正则从字符串中提取，
+    避免在每次进度回调中走异常处理路径。
+    
+    Args:
+        percent: 回调传入的百分比
+        message: 进度消息
+        
+    Returns:
+        int: 0-100之间的百分比，无法解析时返回0
+    """
+    if isinstance(percent, (int, float)) and not isinstance(percent, bool):
+        return max(0, min(100, int(percent))) if math.isfinite(percent) else 0
+    
+    match = None
+    if isinstance(percent, str):
+        match = _NUMBER_PATTERN.fullmatch(percent)
+    if match is None and isinstance(message, str):
+        match = _PERCENT_PATTERN.search(message)
+    if match is None:
+        return 0
+    return max(0, min(100, int(float(match.group(1)))))
+
+
+def _scan_subtitles(directory, recursive=False):
+    """用os.scandir查找目录中的字幕文件，修改时间直接取自目录项
+    
+    Args:
+        directory: 要查找的目录
+        recursive: 是否递归查找子目录
+        
+    Returns:
+        list: (修改时间, 路径) 元组列表
+    """
+    found = []
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            pending.append(entry.path)
+                    elif entry.name.endswith(_SUBTITLE_EXTS):
+                        found.append((entry.stat(follow_symlinks=False).st_mtime, entry.path))
+        except OSError as e:
+            logging.warning("扫描字幕目录失败 %s: %s", current, e)
+    return found
+
+
+def _stat_or_none(path):
+    """获取文件状态，文件不存在时返回None
+    
+    Args:
+        path: 文件路径，可以为空
+        
+    Returns:
+        os.stat_result或None
+    """
+    if not path:
+        return None
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+# 长时间阻塞任务（下载、转换、翻译）专用的线程池，首次使用时创建
+_long_task_pool = None
+
 
-class FetchInfoThread(QThread):
+def long_task_pool():
+    """获取长时间任务专用的线程池
+    
+    下载、转换和翻译会长时间占用线程，放在单独的线程池中运行，
+    避免占满全局线程池后历史记录、封面等短任务只能排队等待。
+    
+    Returns:
+        QThreadPool: 长时间任务线程池
+    """
+    global _long_task_pool
+    if _long_task_pool is None:
+        _long_task_pool = QThreadPool()
+        _long_task_pool.setMaxThreadCount(max(4, QThread.idealThreadCount()))
+    return _long_task_pool
+
+
+class PoolTask(QRunnable):
+    """在线程池中运行的任务基类
+    
+    子类实现_run()，并通过各自的signals对象向界面发送信号。
+    长时间阻塞的任务将LONG_RUNNING设为True，改在long_task_pool()中运行。
+    """
+    
+    LONG_RUNNING = False
+    
+    def __init__(self):
+        super().__init__()
+        # 任务对象由调用方持有，不交给线程池自动删除
+        self.setAutoDelete(False)
+        self._running = threading.Event()
+    
+    def start(self):
+        """提交到线程池执行，长时间任务使用专用线程池"""
+        self._running.set()
+        pool = long_task_pool() if self.LONG_RUNNING else QThreadPool.globalInstance()
+        pool.start(self)
+    
+    def is_running(self):
+        """任务是否已提交且尚未结束"""
+        return self._running.is_set()
+    
+    def run(self):
+        try:
+            self._run()
+        finally:
+            self._running.clear()
+    
+    def _run(self):
+        raise NotImplementedError
+
+
+class FetchInfoSignals(QObject):
+    """获取视频信息任务的信号集合"""
     info_fetched = Signal(dict)
     fetch_error = Signal(str)
+
+
+class FetchInfoThread(PoolTask):
+    """获取视频信息任务"""
     
     def __init__(self, downloader, url, use_cookies=False, browser=None):
         super().__init__()
+        self.signals = FetchInfoSignals()
+        self.cancel_event = threading.Event()
         self.downloader = downloader
         self.url = url
         self.use_cookies = use_cookies
         self.browser = browser
     
-    def run(self):
+    def _run(self):
+        try:
+            video_info = self.downloader.get_video_info(
+                self.url, self.use_cookies, self.browser, cancel_event=self.cancel_event
+            )
+            if not self.cancel_event.is_set():
+                self.signals.info_fetched.emit(video_info)
+        except Exception as e:
+            if not self.cancel_event.is_set():
+                self.signals.fetch_error.emit(str(e))
+    
+    def cancel(self):
+        """取消获取并终止yt-dlp进程，结束后不再发送任何信号，不影响正在进行的下载"""
+        self.cancel_event.set()
+        self.downloader.cancel_info_fetch()
+
+
+class HistoryLoadSignals(QObject):
+    """加载下载历史任务的信号集合"""
+    loaded = Signal(list, dict)  # 记录列表, 统计数据
+    load_error = Signal(str)
+
+
+class HistoryLoader(PoolTask):
+    """在后台线程中查询下载历史记录和统计数据，避免阻塞界面线程
+    
+    指定before时只加载排在该记录之后的下一页，不再查询统计数据，发送的统计数据为空字典。
+    """
+    
+    def __init__(self, keyword=None, status=None, limit=100, before=None):
+        super().__init__()
+        self.signals = HistoryLoadSignals()
+        self.keyword = keyword
+        self.status = status
+        self.limit = limit
+        self.before = before  # 上一页最后一条记录的(start_time, id)
+    
+    def _run(self):
         try:
-            video_info = self.downloader.get_video_info(self.url, self.use_cookies, self.browser)
-            self.info_fetched.emit(video_info)
+            # 线程池中的每个线程使用各自缓存的数据库连接
+            db = get_db()
+            if self.before is None:
+                records, stats = db.get_downloads_with_stats(
+                    self.keyword, status=self.status, limit=self.limit
+                )
+            else:
+                records = db.get_downloads(
+                    self.keyword, status=self.status, limit=self.limit, before=self.before
+                )
+                stats = {}
+            self.signals.loaded.emit(records, stats)
+        except Exception as e:
+            logging.exception("加载下载历史失败")
+            self.signals.load_error.emit(str(e))
+
+
+class ThumbnailSignals(QObject):
+    """封面加载任务的信号集合"""
+    loaded = Signal(str, QImage)  # 封面URL, 缩放后的图片
+    missing = Signal(str)  # 缓存中没有该封面，需要下载
+    load_error = Signal(str)  # 图片无法解码
+
+
+class ThumbnailLoader(PoolTask):
+    """在后台线程中解码并缩放封面，界面线程只需把结果转换为QPixmap
+    
+    缩放结果以PNG保存到封面缓存目录，之后再显示同一封面时直接读取，不再重新缩放。
+    """
+    
+    def __init__(self, url, data=None, width=360, height=200):
+        """初始化封面加载任务
+        
+        Args:
+            url: 封面图片URL
+            data: 刚下载的原始图片数据，为None时从缓存读取
+            width: 显示宽度
+            height: 显示高度
+        """
+        super().__init__()
+        self.signals = ThumbnailSignals()
+        self.url = url
+        self.data = data
+        self.width = width
+        self.height = height
+    
+    def _run(self):
+        try:
+            scaled_path = thumbnail_cache.path_for(self.url, f"_{self.width}x{self.height}.png")
+            
+            # 已经缩放过的封面直接读取
+            if self.data is None and thumbnail_cache.is_fresh(scaled_path):
+                image = QImage(scaled_path)
+                if not image.isNull():
+                    self.signals.loaded.emit(self.url, image)
+                    return
+            
+            data = self.data if self.data is not None else thumbnail_cache.get(self.url)
+            if data is None:
+                self.signals.missing.emit(self.url)
+                return
+            
+            image = QImage.fromData(data)
+            if image.isNull():
+                self.signals.load_error.emit(self.url)
+                return
+            
+            # 新下载的原始图片能够解码才写入缓存
+            if self.data is not None:
+                thumbnail_cache.put(self.url, data)
+            
+            image = image.scaled(self.width, self.height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            if not image.save(scaled_path, "PNG"):
+                logging.warning("保存缩放后的封面失败: %s", scaled_path)
+            self.signals.loaded.emit(self.url, image)
+        except Exception:
+            logging.exception("加载封面失败: %s", self.url)
+            self.signals.load_error.emit(self.url)
+
+
+class TranslateSignals(QObject):
+    """字幕翻译任务的信号集合"""
+    progress = Signal(int, str)  # 百分比, 消息
+    finished = Signal(bool, str, str)  # 是否成功, 消息, 结果字幕路径
+
+
+class TranslateThread(PoolTask):
+    """在长时间任务线程池中检测字幕语言并翻译，通过signals把进度送回界面线程"""
+    
+    LONG_RUNNING = True
+    
+    def __init__(self, subtitle_path, translation_api_url, force_translate_traditional=True, use_n8n=True):
+        """初始化翻译任务
+        
+        Args:
+            subtitle_path: 要翻译的字幕文件路径
+            translation_api_url: 翻译服务API地址
+            force_translate_traditional: 是否强制翻译繁体中文字幕
+            use_n8n: 是否使用n8n工作流进行翻译
+        """
+        # 翻译器依赖chardet，只在实际翻译时才导入
+        from src.utils.subtitle_translator import SubtitleTranslator
+        
+        super().__init__()
+        self.signals = TranslateSignals()
+        self.subtitle_path = subtitle_path
+        self.translator = SubtitleTranslator(
+            translation_api_url=translation_api_url,
+            force_translate_traditional=force_translate_traditional,
+            use_n8n=use_n8n
+        )
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        """请求取消翻译，未发出的请求不再发送，已发出请求的结果直接丢弃"""
+        self.cancel_event.set()
+        self.translator.cancel()
+    
+    def _run(self):
+        try:
+            self.signals.progress.emit(10, "检测字幕语言...")
+            is_chinese, is_traditional = self.translator.is_chinese_subtitle(self.subtitle_path)
+            
+            if is_chinese and not is_traditional:
+                self.signals.progress.emit(100, "字幕已经是简体中文，无需翻译")
+                self.signals.finished.emit(True, "字幕已经是简体中文，无需翻译", self.subtitle_path)
+                return
+            
+            if is_chinese and is_traditional:
+                self.signals.progress.emit(20, "检测到繁体中文字幕，开始翻译...")
+            else:
+                self.signals.progress.emit(20, "检测到外语字幕，开始翻译...")
+            
+            if self.cancel_event.is_set():
+                self.signals.finished.emit(False, "翻译已取消", "")
+                return
+            
+            self.signals.progress.emit(30, "正在翻译字幕，这可能需要一些时间...")
+            translated_path = self.translator.translate(self.subtitle_path)
+            
+            if self.cancel_event.is_set():
+                self.signals.finished.emit(False, "翻译已取消", "")
+            elif translated_path and translated_path != self.subtitle_path:
+                self.signals.progress.emit(90, "翻译完成，正在保存...")
+                self.signals.finished.emit(True, "翻译完成", translated_path)
+            else:
+                self.signals.finished.emit(False, "翻译失败，请检查网络连接或服务配置", "")
         except Exception as e:
-            self.fetch_error.emit(str(e))
+            logging.exception("翻译字幕失败: %s", self.subtitle_path)
+            self.signals.finished.emit(False, f"翻译过程中出错: {str(e)}", "")
 
 
-class DownloadThread(QThread):
+class DownloadSignals(QObject):
+    """下载任务的信号集合"""
     progress_updated = Signal(int, str)
     download_finished = Signal(bool, str)
     convert_progress = Signal(int, str)  # 添加转换进度信号
     convert_finished = Signal(bool, str, str)  # 添加转换完成信号
+
+
+class DownloadThread(PoolTask):
+    """下载任务，在长时间任务线程池中运行，通过signals发送进度"""
     
-    def __init__(self, downloader, video_url, video_format, audio_format, subtitles, thumbnail, output_dir, threads=10, use_cookies=False, browser=None, video_info=None, resume=False, output_path=None):
+    LONG_RUNNING = True
+    
+    def __init__(self, downloader, video_url, video_format, audio_format, subtitles, thumbnail, output_dir, threads=10, use_cookies=False, browser=None, video_info=None, resume=False, output_path=None, main_window=None):
         super().__init__()
+        self.signals = DownloadSignals()
+        # 弱引用主窗口，下载结束后通知其刷新历史列表，不延长窗口生命周期
+        self._main_window_ref = weakref.ref(main_window) if main_window is not None else None
         self.downloader = downloader
         self.video_url = video_url
         self.video_format = video_format
@@ -54,12 +401,12 @@ class DownloadThread(QThread):
         self.output_path = output_path  # 指定的输出路径（用于断点续传）
         self.db = None  # 数据库连接
         self.download_record_id = None  # 下载记录ID
+        self._last_emit_ts = 0.0  # 上次发送进度信号的时间
     
-    def run(self):
+    def _run(self):
         try:
             # 导入数据库模块
-            from src.db.download_history import DownloadHistoryDB
-            self.db = DownloadHistoryDB()
+            self.db = get_db()
             
             # 构建格式规格
             format_spec = f"{self.video_format}+{self.audio_format}" if self.video_format and self.audio_format else (self.video_format or self.audio_format)
@@ -67,40 +414,30 @@ class DownloadThread(QThread):
             # 添加或更新下载记录（根据是否为断点续传）
             if self.resume and self.download_record_id:
                 # 断点续传，更新已有记录状态
-                self.db.update_download_status(
-                    self.download_record_id,
+                db_writer.enqueue(
+                    'update_download_status',
+                    record_id=self.download_record_id,
                     status='进行中',
                     error_message=None  # 清除之前的错误信息
                 )
             else:
-                # 新下载，添加新记录
-                if self.video_info:
-                    # 如果有完整信息，则添加更多详情
-                    self.download_record_id = self.db.add_download(
-                        video_id=self.video_info.get('id'),
-                        title=self.video_info.get('title', '未知标题'),
-                        url=self.video_url,
-                        thumbnail_url=self.video_info.get('thumbnail'),
-                        video_format=self.video_format,
-                        audio_format=self.audio_format,
-                        subtitles=self.subtitles,
-                        output_path=self.output_path  # 可能为None
-                    )
-                else:
-                    # 简单记录，没有详细信息
-                    self.download_record_id = self.db.add_download(
-                        video_id=None,
-                        title=f"从 {self.video_url} 下载的视频",
-                        url=self.video_url,
-                        video_format=self.video_format,
-                        audio_format=self.audio_format,
-                        subtitles=self.subtitles,
-                        output_path=self.output_path  # 可能为None
-                    )
+                # 新下载，添加新记录；没有视频信息时只记录URL
+                info = self.video_info or {}
+                title = info.get('title') or ('未知标题' if info else f"从 {self.video_url} 下载的视频")
+                self.download_record_id = self.db.add_download(
+                    video_id=info.get('id'),
+                    title=title,
+                    url=self.video_url,
+                    thumbnail_url=info.get('thumbnail'),
+                    video_format=self.video_format,
+                    audio_format=self.audio_format,
+                    subtitles=self.subtitles,
+                    output_path=self.output_path  # 可能为None
+                )
             
             # 记录当前下载的记录ID
             if self.download_record_id:
-                logging.info(f"下载线程已创建记录ID: {self.download_record_id}")
+                logging.info("下载线程已创建记录ID: %s", self.download_record_id)
             else:
                 logging.error("下载线程创建记录ID失败")
                 
@@ -124,173 +461,100 @@ class DownloadThread(QThread):
             # 保存下载文件路径到类属性
             self.downloaded_file = downloaded_file
             
-            # 检查下载的字幕文件并更新数据库
+            # 验证通过的字幕文件路径，随最终状态一起写入数据库
+            valid_subtitle_path = None
+            
+            # 检查下载的字幕文件
             if self.download_record_id and self.subtitles:
-                # 首先尝试从下载器中获取字幕文件
-                subtitle_files = []
-                if hasattr(self.downloader, 'subtitle_files'):
-                    subtitle_files = getattr(self.downloader, 'subtitle_files', [])
-                
-                # 找到有效的字幕文件路径
-                subtitle_path = None
-                
-                # 1. 如果下载器已经捕获到字幕文件
-                if subtitle_files and len(subtitle_files) > 0:
-                    for path in subtitle_files:
-                        if os.path.exists(path):
-                            subtitle_path = path
-                            logging.info(f"使用下载器捕获的字幕文件路径: {subtitle_path}")
-                            break
-                
-                # 2. 如果没有找到有效的字幕路径，尝试在输出目录中查找
-                if not subtitle_path and self.output_dir and os.path.exists(self.output_dir):
-                    logging.info("在输出目录中查找字幕文件")
-                    try:
-                        # 在输出目录中查找所有字幕文件
-                        potential_subtitles = []
-                        for ext in ['.srt', '.vtt', '.ass']:
-                            potential_subtitles.extend(glob.glob(os.path.join(self.output_dir, f"*{ext}")))
-                        
-                        if potential_subtitles:
-                            # 按修改时间排序，获取最新的
-                            potential_subtitles.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-                            subtitle_path = potential_subtitles[0]
-                            logging.info(f"在输出目录找到最新的字幕文件: {subtitle_path}")
-                    except Exception as e:
-                        logging.error(f"在输出目录查找字幕文件时出错: {str(e)}")
-                
-                # 3. 如果有视频文件，尝试根据视频文件名查找字幕
-                if not subtitle_path and downloaded_file and os.path.exists(downloaded_file):
-                    logging.info("根据视频文件名查找字幕文件")
-                    try:
-                        video_dir = os.path.dirname(downloaded_file)
-                        video_name = os.path.splitext(os.path.basename(downloaded_file))[0]
-                        
-                        # 先尝试精确匹配
-                        subtitle_candidates = []
-                        for ext in ['.srt', '.vtt', '.ass']:
-                            # 精确匹配
-                            exact_path = os.path.join(video_dir, f"{video_name}{ext}")
-                            if os.path.exists(exact_path):
-                                subtitle_candidates.append(exact_path)
-                            # 模糊匹配
-                            pattern = os.path.join(video_dir, f"{video_name}*{ext}")
-                            subtitle_candidates.extend(glob.glob(pattern))
-                        
-                        if subtitle_candidates:
-                            # 按修改时间排序，获取最新的
-                            subtitle_candidates.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-                            subtitle_path = subtitle_candidates[0]
-                            logging.info(f"根据视频文件名找到字幕文件: {subtitle_path}")
-                    except Exception as e:
-                        logging.error(f"根据视频文件名查找字幕文件时出错: {str(e)}")
-                
-                # 4. 如果还没找到但有字幕选项参数，尝试在整个输出目录中查找任何字幕文件
-                if not subtitle_path and self.output_dir:
-                    logging.info("尝试在输出目录中查找任何字幕文件")
-                    try:
-                        # 查找所有字幕文件
-                        all_subtitles = []
-                        for root, dirs, files in os.walk(self.output_dir):
-                            for file in files:
-                                if file.endswith(('.srt', '.vtt', '.ass')):
-                                    all_subtitles.append(os.path.join(root, file))
-                        
-                        if all_subtitles:
-                            # 按修改时间排序，获取最新的
-                            all_subtitles.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-                            subtitle_path = all_subtitles[0]
-                            logging.info(f"找到最新的字幕文件: {subtitle_path}")
-                    except Exception as e:
-                        logging.error(f"查找所有字幕文件时出错: {str(e)}")
+                # 按优先级查找字幕文件，找到第一个非空文件即停止
+                subtitle_path = self._find_subtitle_file(downloaded_file)
                 
                 # 如果找到了字幕文件路径，更新数据库
                 if subtitle_path:
                     # 检查文件是否有效
                     try:
-                        if os.path.exists(subtitle_path) and os.path.getsize(subtitle_path) > 0:
-                            # 验证是否是文本文件
-                            with open(subtitle_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content_sample = f.read(500)  # 读取前500个字符
-                                is_valid = any(marker in content_sample.lower() for marker in ['webvtt', 'srt', '-->', '[script info]'])
-                            
-                            if is_valid:
-                                logging.info(f"更新字幕文件路径到数据库: {subtitle_path}")
-                                self.db.update_subtitle_path(self.download_record_id, subtitle_path)
-                            else:
-                                logging.warning(f"字幕文件内容无效: {subtitle_path}")
+                        # 验证是否是字幕文件：只读取开头512字节并直接按字节匹配
+                        with open(subtitle_path, 'rb') as f:
+                            content_sample = f.read(512).lower()
+                        is_valid = any(marker in content_sample for marker in _SUBTITLE_MARKERS)
+                        
+                        if is_valid:
+                            logging.info("更新字幕文件路径到数据库: %s", subtitle_path)
+                            valid_subtitle_path = subtitle_path
                         else:
-                            logging.warning(f"字幕文件不存在或大小为0: {subtitle_path}")
+                            logging.warning("字幕文件内容无效: %s", subtitle_path)
                     except Exception as e:
-                        logging.error(f"验证字幕文件时出错: {str(e)}")
+                        logging.error("验证字幕文件时出错: %s", e)
                 else:
                     logging.warning("未找到任何字幕文件")
             
+            # 只获取一次文件状态，供记录更新和后续转换共用
+            file_stat = _stat_or_none(downloaded_file)
+            
             # 更新下载记录
             if self.download_record_id:
                 if self.downloader.is_cancelled:
                     # 如果下载被取消
-                    self.db.update_download_status(
-                        self.download_record_id, 
-                        status='已取消'
+                    db_writer.enqueue(
+                        'update_download_status',
+                        record_id=self.download_record_id,
+                        status='已取消',
+                        subtitle_path=valid_subtitle_path
                     )
-                elif downloaded_file and os.path.exists(downloaded_file):
-                    # 如果下载成功，获取文件大小并更新记录
-                    file_size = os.path.getsize(downloaded_file)
-                    
-                    # 确保路径是.webm文件路径（如果存在的话）
-                    webm_path = downloaded_file
-                    if not webm_path.endswith('.webm') and '.webm' in downloaded_file:
-                        webm_path = re.sub(r'\.[^.]+$', '.webm', downloaded_file)
-                        if os.path.exists(webm_path):
+                elif file_stat is not None:
+                    # 文件名本身带有.webm时（如合并前的中间文件）才改用同名的.webm文件，
+                    # 已是.webm或与webm无关的文件（如新下载的.mp4）不做替换，也无需额外stat
+                    if not downloaded_file.endswith('.webm') and '.webm' in downloaded_file:
+                        webm_path = os.path.splitext(downloaded_file)[0] + '.webm'
+                        webm_stat = _stat_or_none(webm_path)
+                        if webm_stat is not None:
+                            file_stat = webm_stat
                             downloaded_file = webm_path
                             self.downloaded_file = downloaded_file  # 更新类属性
                     
-                    self.db.update_download_status(
-                        self.download_record_id, 
+                    # 文件大小取自最终记录的文件
+                    file_size = file_stat.st_size
+                    
+                    db_writer.enqueue(
+                        'update_download_status',
+                        record_id=self.download_record_id,
                         status='下载完成',
                         output_path=downloaded_file,
-                        file_size=file_size
+                        file_size=file_size,
+                        subtitle_path=valid_subtitle_path
                     )
                 else:
                     # 下载完成但找不到文件
-                    self.db.update_download_status(
-                        self.download_record_id, 
+                    db_writer.enqueue(
+                        'update_download_status',
+                        record_id=self.download_record_id,
                         status='下载完成',
-                        error_message='找不到下载的文件'
+                        error_message='找不到下载的文件',
+                        subtitle_path=valid_subtitle_path
                     )
+                
+                # 在通知界面之前写入状态，保证刷新历史时能看到最新结果
+                db_writer.flush()
             
             # 只有在未取消的情况下才发送完成信号并尝试转换
             if not self.downloader.is_cancelled:
-                if downloaded_file and os.path.exists(downloaded_file):
-                    self.download_finished.emit(True, f"下载完成, 路径: {downloaded_file}")
+                if file_stat is not None:
+                    self.signals.download_finished.emit(True, f"下载完成, 路径: {downloaded_file}")
                     
                     # 检查文件扩展名
                     _, ext = os.path.splitext(downloaded_file)
                     
                     # 如果不是MP4格式，进行转换
                     if ext.lower() != '.mp4':
-                        logging.info(f"下载完成，开始自动转换: {downloaded_file}")
+                        logging.info("下载完成，开始自动转换: %s", downloaded_file)
                         
-                        # 导入视频工具模块
-                        from src.utils.video_utils import convert_video
+                        # 回调中每个进度事件都会检查取消状态，提前绑定到局部变量
+                        cancel_event = self.downloader.cancel_event
                         
                         # 定义进度回调函数
                         def convert_progress_callback(percent, message):
                             # 确保百分比是有效值
-                            try:
-                                percent_value = int(float(percent))
-                                percent_value = max(0, min(100, percent_value))  # 限制在0-100范围内
-                            except:
-                                # 如果百分比无效，尝试从消息中提取
-                                percent_value = 0
-                                if isinstance(message, str) and "%" in message:
-                                    try:
-                                        percent_str = message.split("%")[0].strip().split(" ")[-1]
-                                        percent_value = int(float(percent_str))
-                                        percent_value = max(0, min(100, percent_value))
-                                    except:
-                                        percent_value = 0
+                            percent_value = _parse_percent(percent, message)
                             
                             # 美化消息
                             display_message = message
@@ -300,76 +564,153 @@ class DownloadThread(QThread):
                                     display_message = f"转换中: {percent_value}%"
                             
                             # 发送进度信号
-                            self.convert_progress.emit(percent_value, display_message)
+                            if self._should_emit(percent_value, display_message):
+                                self.signals.convert_progress.emit(percent_value, display_message)
                             
                             # 检查是否下载线程已被取消
-                            return not self.downloader.is_cancelled
+                            return not cancel_event.is_set()
                         
                         # 定义完成回调函数
                         def convert_finished_callback(success, message, file_path):
                             # 发送完成信号
-                            self.convert_finished.emit(success, message, file_path)
+                            self.signals.convert_finished.emit(success, message, file_path)
                         
-                        # 直接调用转换函数，传递记录ID
-                        convert_video(
-                            file_path=downloaded_file,
+                        # 在当前下载任务中直接转换，与转换队列互斥
+                        converter_pool.submit_sync(
+                            downloaded_file,
                             record_id=self.download_record_id,
                             progress_callback=convert_progress_callback,
-                            finished_callback=convert_finished_callback
+                            finished_callback=convert_finished_callback,
+                            db=self.db,
+                            cancel_event=cancel_event
                         )
                 else:
-                    self.download_finished.emit(True, "下载完成！")
+                    self.signals.download_finished.emit(True, "下载完成！")
             
             # 下载完成后刷新历史页面
-            try:
-                # 尝试通过各种路径找到主窗口
-                main_window = None
-                
-                # 直接使用parent
-                if hasattr(self, 'parent') and self.parent and hasattr(self.parent, 'refresh_download_history'):
-                    main_window = self.parent
-                # 如果parent是QWidget，可能是子页面，主窗口是其parent
-                elif hasattr(self, 'parent') and self.parent and hasattr(self.parent, 'parent') and callable(getattr(self.parent, 'parent', None)):
-                    parent_widget = self.parent.parent()
-                    if parent_widget and hasattr(parent_widget, 'refresh_download_history'):
-                        main_window = parent_widget
-                    # 尝试再向上一级查找
-                    elif parent_widget and hasattr(parent_widget, 'parent') and callable(getattr(parent_widget, 'parent', None)):
-                        grandparent = parent_widget.parent()
-                        if grandparent and hasattr(grandparent, 'refresh_download_history'):
-                            main_window = grandparent
-                
-                if main_window:
-                    logging.debug("下载完成，准备刷新下载历史列表")
-                    QMetaObject.invokeMethod(main_window, "refresh_download_history", 
-                                        Qt.ConnectionType.QueuedConnection)
-                else:
-                    # 将警告级别降为调试级别
-                    logging.debug("未找到有refresh_download_history方法的窗口对象，这是正常的")
-            except Exception as e:
-                logging.error(f"尝试刷新下载历史时出错: {str(e)}")
-                import traceback
-                logging.error(traceback.format_exc())
+            main_window = self._main_window_ref() if self._main_window_ref else None
+            if main_window is not None:
+                logging.debug("下载完成，准备刷新下载历史列表")
+                QMetaObject.invokeMethod(main_window, "refresh_download_history",
+                                         Qt.ConnectionType.QueuedConnection)
                 
         except Exception as e:
             # 更新下载记录为失败状态
             if self.download_record_id:
-                self.db.update_download_status(
-                    self.download_record_id, 
+                db_writer.enqueue(
+                    'update_download_status',
+                    record_id=self.download_record_id,
                     status='失败',
                     error_message=str(e)
                 )
+                db_writer.flush()
+            
+            self.signals.download_finished.emit(False, f"下载失败: {str(e)}")
+    
+    def _find_subtitle_file(self, downloaded_file):
+        """按优先级查找下载得到的字幕文件
+        
+        依次尝试下载器捕获的路径、输出目录、视频同名文件和整个输出目录，
+        各策略是惰性的，前一个找到非空文件后不再执行后面的文件系统扫描。
+        
+        Args:
+            downloaded_file: 下载得到的视频文件路径，可以为空
+            
+        Returns:
+            str: 字幕文件路径，找不到时返回None
+        """
+        output_root = os.path.normpath(self.output_dir) if self.output_dir else None
+        top_level = None
+        
+        def output_dir_subtitles():
+            # 只扫描一次输出目录顶层，策略2和3复用这次的结果
+            nonlocal top_level
+            if top_level is None:
+                if output_root and os.path.isdir(output_root):
+                    top_level = _scan_subtitles(output_root)
+                else:
+                    top_level = []
+            return top_level
+        
+        def from_downloader():
+            # 1. 下载器已经捕获到的字幕文件
+            yield from getattr(self.downloader, 'subtitle_files', None) or []
+        
+        def from_output_dir():
+            # 2. 输出目录（不含子目录）中最新的字幕文件
+            found = output_dir_subtitles()
+            if found:
+                yield max(found)[1]
+        
+        def from_video_name():
+            # 3. 与视频文件同名的字幕文件
+            if downloaded_file and os.path.exists(downloaded_file):
+                video_dir = os.path.normpath(os.path.dirname(downloaded_file) or os.curdir)
+                video_name = os.path.splitext(os.path.basename(downloaded_file))[0]
+                
+                # 视频位于输出目录顶层时直接复用扫描结果，否则只扫描视频所在目录
+                if video_dir == output_root:
+                    in_dir = output_dir_subtitles()
+                else:
+                    in_dir = _scan_subtitles(video_dir)
+                
+                # 按文件名前缀匹配（包含精确匹配）
+                subtitle_candidates = [
+                    (mtime, path) for mtime, path in in_dir
+                    if os.path.basename(path).startswith(video_name)
+                ]
+                
+                if subtitle_candidates:
+                    # 取修改时间最新的一个，无需整体排序
+                    yield max(subtitle_candidates)[1]
+        
+        def from_full_walk():
+            # 4. 整个输出目录（含子目录）中最新的字幕文件，只有前面的策略都失败时才递归扫描
+            if output_root and os.path.isdir(output_root):
+                found = _scan_subtitles(output_root, recursive=True)
+                if found:
+                    yield max(found)[1]
+        
+        for strategy in (from_downloader, from_output_dir, from_video_name, from_full_walk):
+            try:
+                for path in strategy():
+                    path_stat = _stat_or_none(path)
+                    if (path_stat is not None and stat.S_ISREG(path_stat.st_mode)
+                            and path_stat.st_size > 0):
+                        logging.info("找到字幕文件 (%s): %s", strategy.__name__, path)
+                        return path
+            except Exception as e:
+                logging.error("查找字幕文件时出错 (%s): %s", strategy.__name__, e)
+        
+        return None
+    
+    def _should_emit(self, percent, message):
+        """判断本次进度是否需要发送信号，普通进度限制在约10Hz
+        
+        Args:
+            percent: 进度百分比
+            message: 进度消息
             
-            self.download_finished.emit(False, f"下载失败: {str(e)}")
+        Returns:
+            bool: 是否发送
+        """
+        now = time.monotonic()
+        if (percent >= 100 or now - self._last_emit_ts >= PROGRESS_EMIT_INTERVAL
+                or any(keyword in message for keyword in _FORCE_EMIT_KEYWORDS)):
+            self._last_emit_ts = now
+            return True
+        return False
     
     def progress_callback(self, percent, message):
-        # 更新进度
-        self.progress_updated.emit(percent, message)
+        # 更新进度，中间的普通进度消息直接丢弃
+        if self._should_emit(percent, message):
+            self.signals.progress_updated.emit(percent, message)
         
-        # 对于取消消息，更新数据库记录
+        # 对于取消消息，更新数据库记录（由db_writer合并写入）
         if "取消" in message and self.download_record_id:
-            self.db.update_download_status(
-                self.download_record_id, 
+            db_writer.enqueue(
+                'update_download_status',
+                record_id=self.download_record_id,
                 status='已取消'
             )
     
@@ -380,228 +721,175 @@ class DownloadThread(QThread):
             
             # 更新下载记录为已取消状态
             if self.download_record_id:
-                self.db.update_download_status(
-                    self.download_record_id, 
+                db_writer.enqueue(
+                    'update_download_status',
+                    record_id=self.download_record_id,
                     status='已取消'
                 )
+                # 取消时同步写入，确保界面随后刷新能看到已取消状态
+                db_writer.flush()
 
 
-# 添加WebM到MP4的转换线程
-class ConvertThread(QThread):
-    """视频转换线程"""
+class ConvertSignals(QObject):
+    """转换任务的信号集合"""
     convert_finished = Signal(bool, str, str)
-    convert_progress = Signal(str)
-    convert_percent = Signal(int)
+    convert_progress = Signal(int, str)  # 百分比和消息合并为一次发送，百分比为-1表示仅更新消息
+
+
+# 添加WebM到MP4的转换任务
+class ConvertThread(PoolTask):
+    """视频转换任务，在长时间任务线程池中运行，通过signals发送进度"""
+    
+    LONG_RUNNING = True
     
-    def __init__(self, file_path, options=None, record_id=None, parent=None):
-        super().__init__(parent)
+    def __init__(self, file_path, options=None, record_id=None):
+        super().__init__()
+        self.signals = ConvertSignals()
         self.file_path = file_path
         self.options = options
         self.record_id = record_id  # 记录ID
-        self.is_canceled = False
         self.process = None  # 存储ffmpeg进程引用
-        self.cancel_lock = threading.Lock()  # 添加锁以避免竞态条件
+        self.cancel_event = threading.Event()  # 取消标志，读取无需加锁
+        self._last_emit_ts = 0.0  # 上次发送进度信号的时间
     
-    def run(self):
+    def _run(self):
         try:
-            # 生成目标文件路径
-            target_file = self.file_path.replace('.webm', '.mp4')
-            
             # 定义进度回调函数
             def progress_callback(percent, message, process_ref=None):
-                # 先检查是否已经取消
-                with self.cancel_lock:
-                    if self.is_canceled:
-                        logging.info("已检测到取消标志，停止转换过程")
-                        return False
+                # 每个进度事件只检查一次取消标志，下一行进度即可生效
+                if self.cancel_event.is_set():
+                    logging.info("已检测到取消标志，停止转换过程")
+                    return False
                 
                 # 存储进程引用
-                if process_ref and not self.process:
+                if process_ref is not None and self.process is None:
                     self.process = process_ref
                 
-                self.convert_percent.emit(percent)
-                self.convert_progress.emit(message)
-                
-                # 再次检查取消状态
-                with self.cancel_lock:
-                    if self.is_canceled:
-                        logging.info("检测到取消请求，正在终止视频转换")
-                        return False
+                # 进度信号限制在约10Hz，中间的进度消息直接丢弃
+                now = time.monotonic()
+                if percent >= 100 or now - self._last_emit_ts >= PROGRESS_EMIT_INTERVAL:
+                    self._last_emit_ts = now
+                    self.signals.convert_progress.emit(percent, message)
                 return True
             
             # 执行转换
             start_time = time.time()
-            output_file = convert_webm_to_mp4(
-                self.file_path, 
+            output_file = converter_pool.run_sync(
+                convert_webm_to_mp4,
+                self.file_path,
+                cancel_event=self.cancel_event,
+                on_wait=lambda: self.signals.convert_progress.emit(-1, WAITING_MESSAGE),
                 progress_callback=progress_callback,
                 options=self.options
             )
             
             # 如果已取消，直接返回取消信息
-            with self.cancel_lock:
-                if self.is_canceled:
-                    self.convert_finished.emit(False, "用户取消了转换", self.file_path)
-                    return
+            if self.cancel_event.is_set():
+                self._finish_cancelled()
+                return
             
             # 检查转换结果
-            if output_file.endswith('.mp4') and os.path.exists(output_file):
+            if os.path.splitext(output_file)[1].lower() == '.mp4' and os.path.exists(output_file):
                 elapsed_time = time.time() - start_time
                 success_message = f"转换完成，耗时: {elapsed_time:.2f}秒"
                 logging.info(success_message)
                 
                 # 确保发送100%进度
-                self.convert_percent.emit(100)
-                self.convert_progress.emit("转换完成")
+                self.signals.convert_progress.emit(100, "转换完成")
                 
                 # 更新数据库中的文件路径为MP4
                 try:
-                    from src.db.download_history import DownloadHistoryDB
-                    db = DownloadHistoryDB()
-                    db.update_conversion_status(
-                        output_file,  # MP4文件路径
-                        status="转换完成",
+                    db_writer.enqueue(
+                        'update_conversion_status',
+                        file_path=output_file,  # MP4文件路径
+                        status="完成",
                         record_id=self.record_id  # 使用指定的记录ID
                     )
-                    logging.info(f"已更新MP4文件路径到数据库，记录ID: {self.record_id}, 文件: {output_file}")
+                    db_writer.flush()
+                    logging.info("已更新MP4文件路径到数据库，记录ID: %s, 文件: %s", self.record_id, output_file)
                 except Exception as e:
-                    logging.error(f"更新MP4文件路径到数据库失败: {str(e)}")
+                    logging.error("更新MP4文件路径到数据库失败: %s", e)
                 
-                self.convert_finished.emit(True, success_message, output_file)
+                self.signals.convert_finished.emit(True, success_message, output_file)
             else:
                 error_message = f"转换失败，请检查源文件和转换设置，文件路径: {self.file_path}"
                 logging.error(error_message)
-                
-                # 更新数据库状态为转换中断
-                try:
-                    from src.db.download_history import DownloadHistoryDB
-                    db = DownloadHistoryDB()
-                    
-                    # 确保文件路径是webm格式，而不是mp4
-                    file_path = self.file_path
-                    if file_path.endswith('.mp4'):
-                        file_path = file_path.replace('.mp4', '.webm')
-                        logging.info(f"转换文件路径从MP4到WebM: {self.file_path} -> {file_path}")
-                    
-                    # 验证文件是否存在
-                    if not os.path.exists(file_path) and os.path.exists(self.file_path):
-                        file_path = self.file_path
-                        logging.info(f"WebM文件不存在，使用原始路径: {file_path}")
-                    
-                    # 更新状态，使用指定的记录ID
-                    result = db.update_conversion_status(
-                        file_path,  # 原始文件路径(webm)
-                        status="转换中断",
-                        error_message=error_message,
-                        record_id=self.record_id
-                    )
-                    if result:
-                        logging.info(f"已成功将状态更新为转换中断，记录ID: {self.record_id}")
-                    else:
-                        logging.warning(f"更新转换中断状态失败，可能找不到记录ID: {self.record_id}")
-                except Exception as ex:
-                    logging.error(f"更新转换中断状态到数据库失败: {str(ex)}")
-                    logging.error(traceback.format_exc())
-                
-                self.convert_finished.emit(False, error_message, self.file_path)
+                self._finalize_failure(error_message)
         except Exception as e:
             # 如果已取消，直接返回取消信息而不是错误
-            with self.cancel_lock:
-                if self.is_canceled:
-                    self.convert_finished.emit(False, "用户取消了转换", self.file_path)
-                    return
-                
-            error_details = traceback.format_exc()
+            if self.cancel_event.is_set():
+                self._finish_cancelled()
+                return
+            
             error_message = f"转换失败: {str(e)}，文件路径: {self.file_path}"
-            logging.error(error_message)
-            logging.error(error_details)
+            logging.exception(error_message)
+            self._finalize_failure(error_message)
+    
+    def _finish_cancelled(self):
+        """通知界面转换已被用户取消"""
+        self.signals.convert_finished.emit(False, "用户取消了转换", self.file_path)
+    
+    def _finalize_failure(self, error_message, status="转换中断"):
+        """记录转换失败状态并通知界面
+        
+        Args:
+            error_message: 写入记录和发送给界面的错误信息
+            status: 写入数据库的转换状态
+        """
+        self._record_conversion_failure(error_message, status)
+        self.signals.convert_finished.emit(False, error_message, self.file_path)
+    
+    def _record_conversion_failure(self, error_message, status="转换中断"):
+        """将转换失败状态写入数据库
+        
+        Args:
+            error_message: 写入记录的错误信息
+            status: 写入数据库的转换状态
+        """
+        try:
+            # 确保文件路径是webm格式，而不是mp4
+            file_path = self.file_path
+            root, ext = os.path.splitext(file_path)
+            if ext.lower() == '.mp4':
+                file_path = root + '.webm'
+                logging.info("转换文件路径从MP4到WebM: %s -> %s", self.file_path, file_path)
             
-            # 更新数据库状态为转换中断
-            try:
-                from src.db.download_history import DownloadHistoryDB
-                db = DownloadHistoryDB()
-                
-                # 确保文件路径是webm格式，而不是mp4
+            # 验证文件是否存在
+            if (file_path != self.file_path and _stat_or_none(file_path) is None
+                    and _stat_or_none(self.file_path) is not None):
                 file_path = self.file_path
-                if file_path.endswith('.mp4'):
-                    file_path = file_path.replace('.mp4', '.webm')
-                    logging.info(f"转换文件路径从MP4到WebM: {self.file_path} -> {file_path}")
-                
-                # 验证文件是否存在
-                if not os.path.exists(file_path) and os.path.exists(self.file_path):
-                    file_path = self.file_path
-                    logging.info(f"WebM文件不存在，使用原始路径: {file_path}")
-                
-                # 更新状态，使用指定的记录ID
-                result = db.update_conversion_status(
-                    file_path,  # 原始文件路径(webm)
-                    status="转换中断",
-                    error_message=error_message,
-                    record_id=self.record_id
-                )
-                if result:
-                    logging.info(f"已成功将状态更新为转换中断，记录ID: {self.record_id}")
-                else:
-                    logging.warning(f"更新转换中断状态失败，可能找不到记录ID: {self.record_id}")
-            except Exception as ex:
-                logging.error(f"更新转换中断状态到数据库失败: {str(ex)}")
-                logging.error(traceback.format_exc())
+                logging.info("WebM文件不存在，使用原始路径: %s", file_path)
             
-            self.convert_finished.emit(False, error_message, self.file_path)
+            # 更新状态，使用指定的记录ID
+            db_writer.enqueue(
+                'update_conversion_status',
+                file_path=file_path,  # 原始文件路径(webm)
+                status=status,
+                error_message=error_message,
+                record_id=self.record_id
+            )
+            db_writer.flush()
+            logging.info("已将状态更新为%s，记录ID: %s", status, self.record_id)
+        except Exception as ex:
+            logging.exception("更新转换中断状态到数据库失败: %s", ex)
     
     def cancel(self):
         """取消转换"""
-        logging.info(f"请求取消视频转换: {self.file_path}")
+        logging.info("请求取消视频转换: %s", self.file_path)
         
-        # 使用锁保护取消操作
-        with self.cancel_lock:
-            self.is_canceled = True
-            
-            # 立即向UI发送取消通知
-            self.convert_progress.emit("正在取消转换...")
+        self.cancel_event.set()
         
-        # 直接终止任何运行中的ffmpeg进程
-        if self.process and self.process.poll() is None:
-            try:
-                logging.info(f"终止ffmpeg进程 PID:{self.process.pid}")
-                if os.name == 'nt':
-                    # 先尝试使用taskkill命令终止进程
-                    try:
-                        subprocess.call(['taskkill', '/F', '/T', '/PID', str(self.process.pid)],
-                                      creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-                        logging.info("成功使用taskkill终止进程")
-                    except Exception as e:
-                        logging.error(f"使用taskkill终止进程失败: {str(e)}")
-                        
-                        # 如果taskkill失败，尝试使用process对象的方法
-                        self.process.terminate()
-                        time.sleep(0.5)
-                        if self.process.poll() is None:
-                            self.process.kill()
-                            logging.info("成功使用process.kill()终止进程")
-                else:
-                    # 类Unix系统
-                    self.process.terminate()
-                    time.sleep(0.5)
-                    if self.process.poll() is None:
-                        self.process.kill()
-                logging.info("ffmpeg进程已终止")
-                
-                # 如果进程仍在运行，尝试更极端的方式
-                if self.process.poll() is None:
-                    logging.warning("进程仍在运行，尝试更极端的终止方式")
-                    try:
-                        # 使用Windows特有的方法强制终止进程
-                        if os.name == 'nt':
-                            os.system(f'TASKKILL /F /PID {self.process.pid} /T')
-                            logging.info(f"尝试使用系统命令终止进程: TASKKILL /F /PID {self.process.pid} /T")
-                        else:
-                            # 类Unix系统
-                            os.system(f'kill -9 {self.process.pid}')
-                            logging.info(f"尝试使用系统命令终止进程: kill -9 {self.process.pid}")
-                    except Exception as ex:
-                        logging.error(f"使用系统命令终止进程失败: {str(ex)}")
-            except Exception as e:
-                logging.error(f"终止进程时出错: {str(e)}")
+        # 立即向UI发送取消通知
+        self.signals.convert_progress.emit(-1, "正在取消转换...")
+        
+        # 在后台线程中终止ffmpeg进程，避免等待进程退出时阻塞界面
+        if self.process is not None and self.process.poll() is None:
+            threading.Thread(
+                target=terminate_process,
+                args=(self.process,),
+                name="ConvertCancel",
+                daemon=True
+            ).start()
         
         # 发送取消结果通知
-        self.convert_finished.emit(False, "转换已取消", self.file_path)
+        self.signals.convert_finished.emit(False, "转换已取消", self.file_path)
@@ -1,60 +1,424 @@
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                         QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+                         QLabel, QPushButton, QTableView,
                          QHeaderView, QAbstractItemView, QMenu, QMessageBox,
                          QLineEdit, QToolBar, QComboBox, QSizePolicy, QSpacerItem,
                          QDialog, QDialogButtonBox, QTextEdit, QStyle, QProgressBar)
-from PySide6.QtCore import Qt, Signal, QSize, QDateTime, QEvent, QTimer, QItemSelectionModel
-from PySide6.QtGui import QIcon, QAction
+from PySide6.QtCore import (Qt, Signal, QSize, QDateTime, QTimer, QItemSelection, QItemSelectionModel,
+                            QAbstractTableModel, QModelIndex, QUrl)
+from PySide6.QtGui import QIcon, QBrush, QDesktopServices
 import os
-import datetime
+import logging
+import time
 import locale
-from src.db.download_history import DownloadHistoryDB
+from src.db.download_history import get_db
+from src.db.writer import db_writer
 from src.ui.convert_dialog import ConvertDialog
-from src.utils.video_utils import convert_video
-import glob
+from src.threads import HistoryLoader, TranslateThread
+from functools import lru_cache
+from html import escape as html_escape
+
+
+def format_timestamp(timestamp):
+    """把Unix时间戳格式化为本地时间字符串，不经过datetime对象"""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+
+
+# 文件大小单位，每级相差1024倍
+_SIZE_UNITS = ("B", "KB", "MB", "GB")
+
+
+@lru_cache(maxsize=4096)
+def format_size(size_bytes):
+    """格式化文件大小，结果按字节数缓存"""
+    # 用二进制位数直接算出单位级别，代替逐级比较
+    level = min(max(int(size_bytes).bit_length() - 1, 0) // 10, len(_SIZE_UNITS) - 1)
+    if level == 0:
+        return f"{size_bytes} B"
+    return f"{size_bytes / (1 << (level * 10)):.2f} {_SIZE_UNITS[level]}"
+
+
+@lru_cache(maxsize=4096)
+def format_duration(seconds):
+    """格式化持续时间"""
+    if seconds < 60:
+        return f"{seconds}秒"
+    elif seconds < 3600:
+        minutes = seconds // 60
+        secs = seconds % 60
+        return f"{minutes}分{secs}秒"
+    else:
+        hours = seconds // 3600
+        minutes = (seconds % 3600) // 60
+        secs = seconds % 60
+        return f"{hours}时{minutes}分{secs}秒"
+
+
+# 可翻译的字幕文件扩展名
+_SUBTITLE_EXTS = ('.srt', '.vtt', '.ass')
+
+# 最多缓存的目录列表数量，超出时丢弃最早缓存的目录
+_DIR_LISTING_CACHE_SIZE = 256
+
+# 目录 -> (修改时间, 文件名集合, 规范化大小写后的文件名集合)，目录内容未变化时复用上次的扫描结果
+_dir_listing_cache = {}
+
+
+def _dir_listing(directory):
+    """列出目录中的文件名，目录修改时间不变时直接返回缓存的结果
+    
+    Args:
+        directory: 目录路径
+        
+    Returns:
+        tuple: (文件名集合, 经os.path.normcase处理的文件名集合)，
+            目录不存在或无法读取时均为空集合
+    """
+    directory = directory or os.curdir
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        _dir_listing_cache.pop(directory, None)
+        return frozenset(), frozenset()
+    
+    cached = _dir_listing_cache.get(directory)
+    if cached is not None and cached[0] == mtime:
+        return cached[1], cached[2]
+    
+    try:
+        with os.scandir(directory) as entries:
+            names = frozenset(entry.name for entry in entries)
+    except OSError:
+        names = frozenset()
+    folded = frozenset(os.path.normcase(name) for name in names)
+    
+    _dir_listing_cache.pop(directory, None)
+    if len(_dir_listing_cache) >= _DIR_LISTING_CACHE_SIZE:
+        _dir_listing_cache.pop(next(iter(_dir_listing_cache)))
+    _dir_listing_cache[directory] = (mtime, names, folded)
+    return names, folded
+
+
+def file_exists(path):
+    """通过缓存的目录列表判断文件是否存在，每个目录只需一次stat
+    
+    文件名按os.path.normcase比较，Windows下与文件系统一样不区分大小写。
+    """
+    if not path:
+        return False
+    return os.path.normcase(os.path.basename(path)) in _dir_listing(os.path.dirname(path))[1]
+
+
+def find_subtitle_files(video_path):
+    """查找与视频文件同名开头的字幕文件
+    
+    Args:
+        video_path: 视频文件路径
+        
+    Returns:
+        list: 字幕文件路径列表
+    """
+    video_dir = os.path.dirname(video_path)
+    video_name = os.path.normcase(os.path.splitext(os.path.basename(video_path))[0])
+    return [
+        os.path.join(video_dir, name)
+        for name in sorted(_dir_listing(video_dir)[0])
+        if os.path.normcase(name).startswith(video_name)
+        and os.path.normcase(name).endswith(_SUBTITLE_EXTS)
+    ]
+
+
+class DownloadHistoryModel(QAbstractTableModel):
+    """下载历史表格模型
+    
+    只保存记录列表，单元格文本和颜色在视图绘制可见行时才生成，
+    刷新时不再为每个单元格创建QTableWidgetItem。每行文本生成后缓存，
+    重新加载时内容未变的记录沿用上次的文本，不再重复格式化。
+    """
+    
+    HEADERS = ["ID", "视频标题", "格式", "输出路径", "大小", "下载时间", "耗时", "状态"]
+    
+    # 状态列文字画刷，只创建一次；未列出的状态使用蓝色
+    STATUS_BRUSHES = {
+        '完成': QBrush(Qt.GlobalColor.darkGreen),
+        '失败': QBrush(Qt.GlobalColor.red),
+        '已取消': QBrush(Qt.GlobalColor.darkGray),
+        '转换中断': QBrush(Qt.GlobalColor.darkYellow),
+    }
+    DEFAULT_STATUS_BRUSH = QBrush(Qt.GlobalColor.blue)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._records = []
+        self._row_texts = []  # 与_records对应的各列显示文本，未生成时为None
+        self._has_more = False  # 数据库中是否还有未加载的后续记录
+        self._fetcher = None
+        self._fetch_pending = False  # 是否正在后台加载下一页
+    
+    def set_fetcher(self, fetcher):
+        """设置表格滚动到底部时加载后续记录的回调
+        
+        Args:
+            fetcher: 回调函数，参数为当前最后一条记录，在后台开始加载下一页，
+                加载完成后调用append_records
+        """
+        self._fetcher = fetcher
+    
+    def records(self):
+        """当前显示的全部记录"""
+        return self._records
+    
+    def set_records(self, records, has_more=False):
+        """替换全部记录，行序不变时只刷新内容变化的行，否则通知视图重置
+        
+        Args:
+            records: 下载记录列表
+            has_more: 数据库中是否还有未加载的后续记录
+        """
+        # 行序未变时逐行比较，只对变化的行发出dataChanged，保留视图的滚动和选择状态
+        if len(records) == len(self._records) and all(
+                new['id'] == old['id'] for new, old in zip(records, self._records)):
+            changed = [row for row, (new, old) in enumerate(zip(records, self._records)) if new != old]
+            self._records = records
+            self._has_more = has_more
+            last_column = self.columnCount() - 1
+            for row in changed:
+                self._row_texts[row] = None
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+            return
+        
+        # 同一ID且内容未变的记录沿用已生成的文本
+        previous = {
+            record['id']: (record, texts)
+            for record, texts in zip(self._records, self._row_texts)
+            if texts is not None
+        }
+        row_texts = []
+        for record in records:
+            cached = previous.get(record['id'])
+            row_texts.append(cached[1] if cached is not None and cached[0] == record else None)
+        
+        self.beginResetModel()
+        self._records = records
+        self._row_texts = row_texts
+        self._has_more = has_more
+        self._fetch_pending = False
+        self.endResetModel()
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return (not parent.isValid() and self._has_more and self._fetcher is not None
+                and not self._fetch_pending and bool(self._records))
+    
+    def fetchMore(self, parent=QModelIndex()):
+        """视图滚动到已加载记录的末尾时在后台加载下一页"""
+        if not self.canFetchMore(parent):
+            return
+        self._fetch_pending = True
+        self._fetcher(self._records[-1])
+    
+    def append_records(self, after_id, rows, has_more):
+        """追加后台加载完成的下一页
+        
+        Args:
+            after_id: 发起加载时最后一条记录的ID
+            rows: 下一页记录
+            has_more: 之后是否还有更多记录
+            
+        Returns:
+            bool: 是否已追加，记录在加载期间被整体替换过时丢弃这一页并返回False
+        """
+        if not self._fetch_pending or not self._records or self._records[-1]['id'] != after_id:
+            return False
+        self._fetch_pending = False
+        self._has_more = has_more
+        if not rows:
+            return True
+        
+        first = len(self._records)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._records = self._records + rows
+        self._row_texts.extend([None] * len(rows))
+        self.endInsertRows()
+        return True
+    
+    def fetch_failed(self):
+        """下一页加载失败，停止自动加载，直到下一次重新加载全部记录"""
+        self._fetch_pending = False
+        self._has_more = False
+    
+    def record(self, row):
+        """获取某一行的记录
+        
+        Args:
+            row: 行号
+            
+        Returns:
+            dict: 下载记录，行不存在时返回None
+        """
+        if 0 <= row < len(self._records):
+            return self._records[row]
+        return None
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        row = index.row()
+        record = self._records[row]
+        column = index.column()
+        
+        if role == Qt.ItemDataRole.DisplayRole:
+            texts = self._row_texts[row]
+            if texts is None:
+                texts = tuple(self._display_text(record, c) for c in range(len(self.HEADERS)))
+                self._row_texts[row] = texts
+            return texts[column]
+        if role == Qt.ItemDataRole.ForegroundRole and column == 7:
+            return self.STATUS_BRUSHES.get(record['status'], self.DEFAULT_STATUS_BRUSH)
+        if role == Qt.ItemDataRole.ToolTipRole and column == 3:
+            # 检查是否有翻译后的字幕，只在鼠标悬停时才访问文件系统
+            subtitle_path = record.get('subtitle_path')
+            if file_exists(subtitle_path):
+                return f"字幕文件: {subtitle_path}"
+        if role == Qt.ItemDataRole.UserRole:
+            return record
+        return None
+    
+    def _display_text(self, record, column):
+        """生成单元格显示文本"""
+        if column == 0:
+            # 数据库记录ID（隐藏列）
+            return str(record['id'])
+        if column == 1:
+            return record['title']
+        if column == 2:
+            # 格式
+            format_str = ""
+            if record['video_format']:
+                format_str += f"视频:{record['video_format']}"
+            if record['audio_format']:
+                if format_str:
+                    format_str += " + "
+                format_str += f"音频:{record['audio_format']}"
+            return format_str
+        if column == 3:
+            return record['output_path'] or ""
+        if column == 4:
+            # 文件大小
+            file_size = record['file_size'] or 0
+            return format_size(file_size) if file_size > 0 else "未知"
+        if column == 5:
+            # 下载时间
+            start_time = record['start_time']
+            if start_time:
+                return format_timestamp(start_time)
+            return "未知"
+        if column == 6:
+            # 耗时
+            duration = record['duration']
+            if duration and duration > 0:
+                return format_duration(duration)
+            if record['status'] == '进行中':
+                return "进行中..."
+            elif record['status'] == '已取消':
+                return "--"
+            elif record['status'] == '转换中断':
+                return "中断"
+            return "未知"
+        if column == 7:
+            return record['status']
+        return None
 
 
 class DownloadHistoryPage(QWidget):
-    delete_history_requested = Signal(int)  # 单个记录ID
+    delete_history_requested = Signal(list)  # 被删除的记录ID列表
     clear_all_requested = Signal()
     redownload_requested = Signal(dict)  # 发送下载记录信息
     continue_download_requested = Signal(dict)  # 发送下载记录信息
     continue_conversion_requested = Signal(dict)  # 保留此信号定义，以防未来需要
     
+    # 每次从数据库加载的记录数，滚动到底部时再加载下一页
+    PAGE_SIZE = 200
+    
+    # 缓存的过滤条件查询结果数上限
+    RESULT_CACHE_SIZE = 16
+    
+    # 标准图标在所有实例间共享，每种只向样式解析一次
+    _standard_icons = {}
+    
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.db = DownloadHistoryDB()
+        self.db = get_db()  # 与界面线程中的其它模块共用同一个连接
+        self._history_loader = None  # 最近一次提交的后台加载任务
+        self._previous_loader = None  # 上一次的加载任务，保证其run()完全退出前不被回收
+        self._more_loader = None  # 最近一次提交的下一页加载任务
+        self._more_loaders = []  # 尚未结束的下一页加载任务，保证其run()完全退出前不被回收
+        self._loading = False  # 是否有加载任务尚未返回结果
+        self._reload_pending = False  # 加载期间又收到刷新请求
+        self._last_applied_width = -1  # 上次调整列宽时的表格宽度
+        self._result_cache = {}  # (关键词, 状态) -> (记录列表, 统计数据, 是否还有更多)
+        self._displayed_key = None  # 表格当前显示结果对应的过滤条件
+        self._last_fingerprint = None  # 上次加载时的数据库变化标记
+        self._translate_threads = []  # 对话框已关闭但仍在运行的翻译任务
         self.setup_ui()
         self.load_download_history()
         
-        # 监听窗口大小变化事件
-        self.installEventFilter(self)
+        # 列宽调整合并：拖动窗口时连续的大小变化只在每帧(约16毫秒)调整一次
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(16)
+        self._resize_timer.timeout.connect(self.adjust_column_widths)
         
-        # 添加自动刷新定时器
+        # 添加自动刷新定时器，每10秒刷新一次，只在页面显示期间运行(见showEvent/hideEvent)
         self.refresh_timer = QTimer(self)
-        self.refresh_timer.timeout.connect(self.load_download_history)
-        self.refresh_timer.start(10000)  # 每10秒刷新一次
+        self.refresh_timer.setInterval(10000)
+        self.refresh_timer.timeout.connect(self._on_refresh_timeout)
+        
+        # 搜索和过滤防抖：连续输入时只在停止350毫秒后刷新一次
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(350)
+        self._search_timer.timeout.connect(self.apply_filters)
     
-    def eventFilter(self, obj, event):
-        """事件过滤器，处理窗口大小变化"""
-        if obj == self and event.type() == QEvent.Type.Resize:
-            # 确保表格已初始化
-            if hasattr(self, 'history_table') and self.history_table.width() > 0:
-                self.adjust_column_widths()
-        return super().eventFilter(obj, event)
+    def resizeEvent(self, event):
+        """窗口大小变化时延迟调整列宽，已在等待时不重复启动定时器"""
+        super().resizeEvent(event)
+        if hasattr(self, '_resize_timer') and not self._resize_timer.isActive():
+            self._resize_timer.start()
     
     def adjust_column_widths(self):
-        """根据窗口大小调整列宽比例"""
-        total_width = self.history_table.width() - 20  # 减去滚动条宽度
-        
-        # 设置每列的宽度比例 (跳过ID列 - 索引0，因为它是隐藏的)
-        self.history_table.setColumnWidth(1, int(total_width * 0.25))  # 标题列
-        self.history_table.setColumnWidth(2, int(total_width * 0.12))  # 格式列
-        self.history_table.setColumnWidth(3, int(total_width * 0.25))  # 路径列
-        self.history_table.setColumnWidth(4, int(total_width * 0.08))  # 大小列
-        self.history_table.setColumnWidth(5, int(total_width * 0.12))  # 时间列
-        self.history_table.setColumnWidth(6, int(total_width * 0.08))  # 耗时列
-        # 最后一列(状态)不需要设置，会自动伸展
+        """根据窗口大小调整列宽比例，宽度未变化时不做任何操作"""
+        table_width = self.history_table.width()
+        if table_width <= 0 or table_width == self._last_applied_width:
+            return
+        self._last_applied_width = table_width
+        
+        total_width = table_width - 20  # 减去滚动条宽度
+        
+        # 设置列宽期间暂停表头重绘，只重新布局一次
+        header = self.history_table.horizontalHeader()
+        header.setUpdatesEnabled(False)
+        try:
+            # 设置每列的宽度比例 (跳过ID列 - 索引0，因为它是隐藏的)
+            self.history_table.setColumnWidth(1, int(total_width * 0.25))  # 标题列
+            self.history_table.setColumnWidth(2, int(total_width * 0.12))  # 格式列
+            self.history_table.setColumnWidth(3, int(total_width * 0.25))  # 路径列
+            self.history_table.setColumnWidth(4, int(total_width * 0.08))  # 大小列
+            self.history_table.setColumnWidth(5, int(total_width * 0.12))  # 时间列
+            self.history_table.setColumnWidth(6, int(total_width * 0.08))  # 耗时列
+            # 最后一列(状态)不需要设置，会自动伸展
+        finally:
+            header.setUpdatesEnabled(True)
     
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -86,12 +450,12 @@ class DownloadHistoryPage(QWidget):
         
         # 刷新按钮
         self.refresh_btn = QPushButton("刷新")
-        self.refresh_btn.setIcon(self.style().standardIcon(QStyle.SP_BrowserReload))
+        self.refresh_btn.setIcon(self._standard_icon(QStyle.SP_BrowserReload))
         self.refresh_btn.clicked.connect(self.load_download_history)
         
         # 清空历史按钮
         self.clear_btn = QPushButton("清空历史")
-        self.clear_btn.setIcon(self.style().standardIcon(QStyle.SP_DialogDiscardButton))
+        self.clear_btn.setIcon(self._standard_icon(QStyle.SP_DialogDiscardButton))
         self.clear_btn.clicked.connect(self.on_clear_all_clicked)
         
         # 添加到工具栏
@@ -103,18 +467,16 @@ class DownloadHistoryPage(QWidget):
         
         layout.addLayout(toolbar)
         
-        # 下载历史表格
-        self.history_table = QTableWidget()
+        # 下载历史表格，数据由模型按需提供
+        self.history_model = DownloadHistoryModel(self)
+        self.history_model.set_fetcher(self._fetch_more_records)
+        self.history_table = QTableView()
+        self.history_table.setModel(self.history_model)
         self.history_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.history_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.history_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.history_table.customContextMenuRequested.connect(self.show_context_menu)
-        
-        # 设置列（包含隐藏的ID列）
-        self.history_table.setColumnCount(8)
-        self.history_table.setHorizontalHeaderLabels([
-            "ID", "视频标题", "格式", "输出路径", "大小", "下载时间", "耗时", "状态"
-        ])
+        self._build_context_menu()
         
         # 隐藏ID列
         self.history_table.hideColumn(0)
@@ -135,141 +497,239 @@ class DownloadHistoryPage(QWidget):
         status_bar.addWidget(self.status_label)
         
         layout.addLayout(status_bar)
+    
+    def _standard_icon(self, standard_pixmap):
+        """获取缓存的标准图标
         
-        # 窗口显示后设置初始列宽
-        QTimer.singleShot(100, self.adjust_column_widths)
+        Args:
+            standard_pixmap: QStyle.StandardPixmap枚举值
+            
+        Returns:
+            QIcon: 对应的图标
+        """
+        icon = self._standard_icons.get(standard_pixmap)
+        if icon is None:
+            icon = self.style().standardIcon(standard_pixmap)
+            self._standard_icons[standard_pixmap] = icon
+        return icon
+    
+    def _on_refresh_timeout(self):
+        """定时刷新，页面不可见或主窗口最小化时跳过"""
+        if not self.isVisible() or self.window().isMinimized():
+            return
+        self.load_download_history()
+    
+    def _current_filter_key(self):
+        """当前搜索和过滤条件，作为查询结果缓存的键"""
+        status_filter = self.status_filter.currentData()
+        search_text = self.search_input.text().strip()
+        return (search_text or None, None if status_filter == "all" else status_filter)
+    
+    def mark_dirty(self):
+        """丢弃缓存的查询结果，之后的过滤条件切换都会重新查询数据库"""
+        self._result_cache.clear()
+    
+    def apply_filters(self):
+        """按当前过滤条件显示记录，数据库未变化且同一条件已查询过时直接使用缓存的结果"""
+        self._check_fingerprint()
+        key = self._current_filter_key()
+        cached = self._result_cache.get(key)
+        if cached is None or self._loading:
+            self._start_history_loader()
+            return
+        self._apply_history(key, *cached)
     
     def load_download_history(self):
-        """从数据库加载下载历史记录"""
-        # 保存当前滚动位置
-        current_scroll_position = self.history_table.verticalScrollBar().value() if self.history_table.rowCount() > 0 else 0
+        """从数据库重新加载下载历史记录
         
-        # 保存当前选中的行ID
-        selected_ids = []
-        for index in self.history_table.selectionModel().selectedRows():
-            row = index.row()
-            item = self.history_table.item(row, 1)  # 现在标题是第2列 (索引1)
-            if item:
-                selected_ids.append(item.data(Qt.ItemDataRole.UserRole))
+        数据库自上次加载后没有变化时直接使用缓存的结果，否则缓存全部失效并重新查询。
+        """
+        self.apply_filters()
+    
+    def _check_fingerprint(self):
+        """比较数据库状态指纹，数据库自上次检查后有变化时丢弃缓存的查询结果"""
+        try:
+            fingerprint = self.db.get_state_fingerprint()
+        except Exception as e:
+            logging.error(f"获取数据库状态失败: {str(e)}")
+            fingerprint = None
+        
+        if fingerprint is not None and fingerprint == self._last_fingerprint:
+            return
         
-        # 清空表格
-        self.history_table.setRowCount(0)
+        self._last_fingerprint = fingerprint
+        self.mark_dirty()
+    
+    def _start_history_loader(self):
+        """在后台线程中从数据库加载下载历史记录，完成后由_on_history_loaded填充表格"""
+        # 上一次加载尚未完成时只做标记，完成后再按最新的过滤条件加载一次
+        if self._loading:
+            self._reload_pending = True
+            return
+        self._loading = True
+        
+        # 状态过滤在SQL中完成，统计信息在同一次查询中一起取回
+        key = self._current_filter_key()
+        keyword, status = key
+        
+        # 刷新当前显示的结果时，滚动加载过的记录也一起重新加载
+        limit = self.PAGE_SIZE
+        if key == self._displayed_key:
+            limit = max(limit, self.history_model.rowCount())
+        
+        self._previous_loader = self._history_loader
+        self._history_loader = HistoryLoader(keyword, status=status, limit=limit)
+        self._history_loader.signals.loaded.connect(self._on_history_loaded)
+        self._history_loader.signals.load_error.connect(self._on_history_load_error)
+        self._history_loader.start()
+    
+    def _on_history_loaded(self, records, stats):
+        """后台加载完成，缓存结果并在界面线程中更新表格
         
-        # 获取当前过滤器
-        status_filter = self.status_filter.currentData()
-        search_text = self.search_input.text().strip()
+        Args:
+            records: 下载记录列表
+            stats: 统计数据
+        """
+        self._loading = False
+        if self._reload_pending:
+            # 结果已过时，直接按最新条件重新加载
+            self._reload_pending = False
+            self.load_download_history()
+            return
         
-        # 根据过滤条件获取数据
-        if search_text:
-            # 搜索模式
-            records = self.db.search_downloads(search_text)
-        else:
-            # 普通列表模式
-            records = self.db.get_all_downloads()
+        # 缓存条目数有上限，超出时整体丢弃
+        if len(self._result_cache) >= self.RESULT_CACHE_SIZE:
+            self._result_cache.clear()
+        loader = self._history_loader
+        key = (loader.keyword, loader.status)
+        has_more = len(records) >= loader.limit
+        self._result_cache[key] = (records, stats, has_more)
         
-        # 应用状态过滤
-        if status_filter != "all":
-            records = [r for r in records if r['status'] == status_filter]
+        self._apply_history(key, records, stats, has_more)
+    
+    def _fetch_more_records(self, last_record):
+        """表格滚动到底部时在后台加载下一页记录
         
-        # 填充表格
-        self.history_table.setRowCount(len(records))
+        按最后一条记录的(start_time, id)翻页，两页之间新增的下载不会造成重复行。
         
-        # 记录新行与ID的映射
-        row_id_map = {}
+        Args:
+            last_record: 当前显示的最后一条记录
+        """
+        keyword, status = self._displayed_key
+        self._more_loaders = [loader for loader in self._more_loaders if loader.is_running()]
         
-        for i, record in enumerate(records):
-            # 数据库记录ID（隐藏列）
-            id_item = QTableWidgetItem(str(record['id']))
-            self.history_table.setItem(i, 0, id_item)
-            
-            # 视频标题
-            title_item = QTableWidgetItem(record['title'])
-            title_item.setData(Qt.ItemDataRole.UserRole, record['id'])  # 存储记录ID
-            self.history_table.setItem(i, 1, title_item)
-            
-            # 记录行号与ID的映射
-            row_id_map[record['id']] = i
-            
-            # 格式
-            format_str = ""
-            if record['video_format']:
-                format_str += f"视频:{record['video_format']}"
-            if record['audio_format']:
-                if format_str:
-                    format_str += " + "
-                format_str += f"音频:{record['audio_format']}"
-            self.history_table.setItem(i, 2, QTableWidgetItem(format_str))
-            
-            # 输出路径
-            path_item = QTableWidgetItem(record['output_path'] if record['output_path'] else "")
-            self.history_table.setItem(i, 3, path_item)
-            
-            # 检查是否有翻译后的字幕
-            if record.get('subtitle_path') and os.path.exists(record.get('subtitle_path')):
-                path_item.setToolTip(f"字幕文件: {record.get('subtitle_path')}")
-            
-            # 文件大小
-            file_size = record['file_size'] or 0
-            size_str = self.format_size(file_size) if file_size > 0 else "未知"
-            self.history_table.setItem(i, 4, QTableWidgetItem(size_str))
-            
-            # 下载时间
-            start_time = record['start_time']
-            if start_time:
-                dt = datetime.datetime.fromtimestamp(start_time)
-                time_str = dt.strftime("%Y-%m-%d %H:%M:%S")
-            else:
-                time_str = "未知"
-            self.history_table.setItem(i, 5, QTableWidgetItem(time_str))
-            
-            # 耗时
-            duration = record['duration']
-            if duration and duration > 0:
-                duration_str = self.format_duration(duration)
-            else:
-                if record['status'] == '进行中':
-                    duration_str = "进行中..."
-                elif record['status'] == '已取消':
-                    duration_str = "--"
-                elif record['status'] == '转换中断':
-                    duration_str = "中断"
-                else:
-                    duration_str = "未知"
-            self.history_table.setItem(i, 6, QTableWidgetItem(duration_str))
-            
-            # 状态
-            status = record['status']
-            status_item = QTableWidgetItem(status)
-            if status == '完成':
-                status_item.setForeground(Qt.GlobalColor.darkGreen)
-            elif status == '失败':
-                status_item.setForeground(Qt.GlobalColor.red)
-            elif status == '已取消':
-                status_item.setForeground(Qt.GlobalColor.darkGray)
-            elif status == '转换中断':
-                status_item.setForeground(Qt.GlobalColor.darkYellow)
-            else:
-                status_item.setForeground(Qt.GlobalColor.blue)
-            self.history_table.setItem(i, 7, QTableWidgetItem(status_item))
+        self._more_loader = HistoryLoader(
+            keyword, status=status, limit=self.PAGE_SIZE,
+            before=(last_record['start_time'], last_record['id'])
+        )
+        self._more_loader.signals.loaded.connect(self._on_more_records_loaded)
+        self._more_loader.signals.load_error.connect(self._on_more_records_error)
+        self._more_loaders.append(self._more_loader)
+        
+        # 加载期间在表格上显示忙碌光标
+        self.history_table.viewport().setCursor(Qt.CursorShape.BusyCursor)
+        self._more_loader.start()
+    
+    def _on_more_records_loaded(self, rows, _stats):
+        """下一页加载完成，追加到表格并同步更新缓存的查询结果"""
+        loader = self._more_loader
+        if loader is None or self.sender() is not loader.signals:
+            return
+        self._more_loader = None
+        self.history_table.viewport().unsetCursor()
         
-        # 恢复选中项
-        if selected_ids:
-            selection_model = self.history_table.selectionModel()
-            for record_id in selected_ids:
-                if record_id in row_id_map:
-                    row = row_id_map[record_id]
-                    index = self.history_table.model().index(row, 1)  # 现在标题是第2列 (索引1)
-                    selection_model.select(index, QItemSelectionModel.SelectionFlag.Select | QItemSelectionModel.SelectionFlag.Rows)
+        has_more = len(rows) >= loader.limit
+        after_id = loader.before[1]
+        if not self.history_model.append_records(after_id, rows, has_more):
+            return
         
-        # 恢复滚动位置
-        self.history_table.verticalScrollBar().setValue(current_scroll_position)
+        key = (loader.keyword, loader.status)
+        cached = self._result_cache.get(key)
+        if cached is not None and cached[0] and cached[0][-1]['id'] == after_id:
+            self._result_cache[key] = (cached[0] + rows, cached[1], has_more)
+    
+    def _on_more_records_error(self, message):
+        """下一页加载失败"""
+        loader = self._more_loader
+        if loader is None or self.sender() is not loader.signals:
+            return
+        self._more_loader = None
+        self.history_table.viewport().unsetCursor()
+        logging.error(f"加载更多下载历史失败: {message}")
+        self.history_model.fetch_failed()
+    
+    def _apply_history(self, key, records, stats, has_more):
+        """用查询结果更新统计信息和表格
+        
+        Args:
+            key: 查询结果对应的过滤条件
+            records: 下载记录列表
+            stats: 统计数据
+            has_more: 数据库中是否还有未加载的后续记录
+        """
+        self._displayed_key = key
         
         # 更新统计信息
-        self.update_status_bar()
+        self.update_status_bar(stats)
+        
+        # 结果与当前显示的完全相同时不重建表格，选中和滚动位置自然保持不变
+        if records == self.history_model.records():
+            return
+        
+        # 保存当前滚动位置
+        current_scroll_position = self.history_table.verticalScrollBar().value() if self.history_model.rowCount() > 0 else 0
+        
+        # 保存当前选中的行ID
+        selected_ids = []
+        for index in self.history_table.selectionModel().selectedRows():
+            row = index.row()
+            record = self._record_at_row(row)
+            if record:
+                selected_ids.append(record['id'])
+        
+        # 替换数据、恢复选中和滚动位置期间暂停重绘，完成后只绘制一次
+        self.history_table.setUpdatesEnabled(False)
+        try:
+            # 整体替换模型数据，单元格在绘制时才生成
+            self.history_model.set_records(records, has_more)
+            
+            # 恢复选中项
+            if selected_ids:
+                # 记录ID与新行号的映射
+                row_id_map = {record['id']: i for i, record in enumerate(records)}
+                
+                # 先收集所有要选中的行，再一次性选中，只触发一次selectionChanged
+                selection = QItemSelection()
+                for record_id in selected_ids:
+                    row = row_id_map.get(record_id)
+                    if row is not None:
+                        index = self.history_model.index(row, 1)  # 标题是第2列 (索引1)
+                        selection.select(index, index)
+                if not selection.isEmpty():
+                    self.history_table.selectionModel().select(
+                        selection,
+                        QItemSelectionModel.SelectionFlag.Select | QItemSelectionModel.SelectionFlag.Rows
+                    )
+            
+            # 恢复滚动位置
+            self.history_table.verticalScrollBar().setValue(current_scroll_position)
+        finally:
+            self.history_table.setUpdatesEnabled(True)
     
-    def update_status_bar(self):
-        """更新状态栏信息"""
-        stats = self.db.get_download_stats()
+    def _on_history_load_error(self, message):
+        """后台加载失败"""
+        self._loading = False
+        self._reload_pending = False
+        self.status_label.setText(f"加载下载历史失败: {message}")
+    
+    def update_status_bar(self, stats=None):
+        """更新状态栏信息
+        
+        Args:
+            stats: 已查询到的统计数据，为None时重新查询
+        """
+        if stats is None:
+            stats = self.db.get_download_stats()
         
         status_text = (f"总计: {stats['total']} | "
                       f"成功: {stats['completed']} | "
@@ -282,11 +742,11 @@ class DownloadHistoryPage(QWidget):
     
     def on_search_changed(self):
         """搜索框文本变化事件"""
-        self.load_download_history()
+        self._search_timer.start()
     
     def on_filter_changed(self):        
         """状态过滤器变化事件"""        
-        self.load_download_history()        
+        self._search_timer.start()
         
     def on_clear_all_clicked(self):        
         """清空全部历史点击事件"""        
@@ -299,94 +759,69 @@ class DownloadHistoryPage(QWidget):
             
     def on_row_double_clicked(self, index):        
         """表格行双击事件"""        
-        row = index.row()        
-        # 直接从ID列获取记录ID (索引0)        
-        record_id = int(self.history_table.item(row, 0).text())        
-        record = self.db.get_download_by_id(record_id)                
+        record = self._record_at_row(index.row())
         if record:            
             self.show_record_details(record)
     
-    def show_context_menu(self, position):
-        """显示右键菜单"""
+    def _build_context_menu(self):
+        """创建右键菜单，所有动作只创建一次，显示时按记录状态切换可见性"""
         menu = QMenu(self)
         
+        self._redownload_action = menu.addAction("重新下载")
+        self._redownload_action.triggered.connect(lambda: self.on_redownload_triggered(self._context_record))
+        
+        self._continue_action = menu.addAction("继续下载")
+        self._continue_action.triggered.connect(lambda: self.on_continue_download_triggered(self._context_record))
+        
+        self._convert_action = menu.addAction("转换为MP4")
+        self._convert_action.triggered.connect(lambda: self.on_continue_conversion_triggered(self._context_record))
+        
+        self._translate_action = menu.addAction("翻译字幕")
+        self._translate_action.triggered.connect(lambda: self.on_translate_subtitle_triggered(self._context_record))
+        
+        menu.addAction("查看详情").triggered.connect(self.on_view_action_triggered)
+        menu.addAction("打开所在文件夹").triggered.connect(self.on_open_folder_triggered)
+        menu.addSeparator()
+        menu.addAction("删除记录").triggered.connect(self.on_delete_action_triggered)
+        
+        self._context_menu = menu
+        self._context_record = None  # 当前右键菜单对应的记录
+    
+    def show_context_menu(self, position):
+        """显示右键菜单"""
         # 获取选中的行
         selected_rows = self.history_table.selectionModel().selectedRows()
         if not selected_rows:
             return
         
-        # 获取选中行的记录        
-        row = selected_rows[0].row()        
-        # 直接从ID列获取记录ID       
-        record_id = int(self.history_table.item(row, 0).text())        
-        record = self.db.get_download_by_id(record_id)
+        # 获取选中行的记录
+        record = self._record_at_row(selected_rows[0].row())
         if not record:
             return
+        self._context_record = record
         
-        # 创建菜单动作
-        view_action = QAction("查看详情", self)
-        open_folder_action = QAction("打开所在文件夹", self)
-        delete_action = QAction("删除记录", self)
+        status = record['status']
+        output_path = record['output_path']
         
-        # 根据状态添加重新下载或继续下载选项
-        if record['status'] == '完成':
-            redownload_action = QAction("重新下载", self)
-            redownload_action.triggered.connect(lambda: self.on_redownload_triggered(record))
-            menu.addAction(redownload_action)
-            
-            # 如果是已完成状态且输出路径是.webm文件，添加"转换为MP4"选项
-            if record['output_path'] and record['output_path'].endswith('.webm') and os.path.exists(record['output_path']):
-                convert_action = QAction("转换为MP4", self)
-                convert_action.triggered.connect(lambda: self.on_continue_conversion_triggered(record))
-                menu.addAction(convert_action)
-                
-            # 添加字幕翻译选项
-            if record['subtitles']:  # 如果有下载字幕
-                translate_action = QAction("翻译字幕", self)
-                translate_action.triggered.connect(lambda: self.on_translate_subtitle_triggered(record))
-                menu.addAction(translate_action)
-            else:
-                # 即使没有记录字幕，也尝试在视频目录查找字幕文件
-                if record['output_path'] and os.path.exists(record['output_path']):
-                    video_dir = os.path.dirname(record['output_path'])
-                    video_name = os.path.splitext(os.path.basename(record['output_path']))[0]
-                    subtitle_files = []
-                    for ext in ['.srt', '.vtt', '.ass']:
-                        pattern = os.path.join(video_dir, f"{video_name}*{ext}")
-                        subtitle_files.extend(glob.glob(pattern))
-                    
-                    if subtitle_files:
-                        translate_action = QAction("翻译字幕", self)
-                        translate_action.triggered.connect(lambda: self.on_translate_subtitle_triggered(record))
-                        menu.addAction(translate_action)
-        elif record['status'] in ['失败', '已取消']:
-            continue_action = QAction("继续下载", self)
-            continue_action.triggered.connect(lambda: self.on_continue_download_triggered(record))
-            menu.addAction(continue_action)
-        elif record['status'] == '转换中断':
-            # 对于转换中断的记录，添加"重新下载"和"转换为MP4"选项
-            redownload_action = QAction("重新下载", self)
-            redownload_action.triggered.connect(lambda: self.on_redownload_triggered(record))
-            menu.addAction(redownload_action)
-            
-            # 添加"转换为MP4"选项，不再检查文件路径是否存在
-            convert_action = QAction("转换为MP4", self)
-            convert_action.triggered.connect(lambda: self.on_continue_conversion_triggered(record))
-            menu.addAction(convert_action)
-        
-        # 添加动作到菜单
-        menu.addAction(view_action)
-        menu.addAction(open_folder_action)
-        menu.addSeparator()
-        menu.addAction(delete_action)
+        # 已完成和转换中断的记录可以重新下载，失败和已取消的记录可以继续下载
+        self._redownload_action.setVisible(status in ('完成', '转换中断'))
+        self._continue_action.setVisible(status in ('失败', '已取消'))
+        
+        # 转换中断的记录总是可以转换；已完成的记录只在输出为仍存在的.webm文件时可以转换
+        self._convert_action.setVisible(
+            status == '转换中断'
+            or (status == '完成' and bool(output_path) and output_path.endswith('.webm') and file_exists(output_path))
+        )
         
-        # 连接信号
-        view_action.triggered.connect(self.on_view_action_triggered)
-        open_folder_action.triggered.connect(self.on_open_folder_triggered)
-        delete_action.triggered.connect(self.on_delete_action_triggered)
+        # 已完成的记录有下载字幕，或能在视频目录找到字幕文件时可以翻译
+        self._translate_action.setVisible(
+            status == '完成'
+            and (bool(record['subtitles'])
+                 or (file_exists(output_path) and bool(find_subtitle_files(output_path))))
+        )
         
         # 显示菜单
-        menu.exec(self.history_table.viewport().mapToGlobal(position))
+        self._context_menu.exec(self.history_table.viewport().mapToGlobal(position))
     
     def on_view_action_triggered(self):
         """查看详情动作"""
@@ -394,11 +829,8 @@ class DownloadHistoryPage(QWidget):
         if not selected_rows:
             return
         
-        # 获取第一个选中行的记录ID        
-        row = selected_rows[0].row()        
-        # 直接从ID列获取记录ID        
-        record_id = int(self.history_table.item(row, 0).text())        
-        record = self.db.get_download_by_id(record_id)
+        # 获取第一个选中行的记录
+        record = self._record_at_row(selected_rows[0].row())
         
         if record:
             self.show_record_details(record)
@@ -409,16 +841,12 @@ class DownloadHistoryPage(QWidget):
         if not selected_rows:
             return
         
-        # 获取第一个选中行的输出路径        
-        row = selected_rows[0].row()        
-        # 直接从ID列获取记录ID        
-        record_id = int(self.history_table.item(row, 0).text())        
-        record = self.db.get_download_by_id(record_id)
+        # 获取第一个选中行的记录
+        record = self._record_at_row(selected_rows[0].row())
         
-        if record and record['output_path'] and os.path.exists(os.path.dirname(record['output_path'])):
-            folder_path = os.path.dirname(record['output_path'])
-            os.startfile(folder_path)
-        else:
+        # 交给系统文件管理器异步打开，路径无效时openUrl返回False
+        folder_path = os.path.dirname(record['output_path']) if record and record['output_path'] else ""
+        if not folder_path or not QDesktopServices.openUrl(QUrl.fromLocalFile(folder_path)):
             QMessageBox.warning(self, "无法打开文件夹", "文件夹不存在或路径无效")
     
     def on_delete_action_triggered(self):
@@ -435,13 +863,10 @@ class DownloadHistoryPage(QWidget):
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            # 执行删除            
-            for index in selected_rows:                
-                row = index.row()                
-                # 直接从ID列获取记录ID                
-                record_id = int(self.history_table.item(row, 0).text())                
-                self.db.delete_download(record_id)                
-                self.delete_history_requested.emit(record_id)
+            # 直接从ID列获取记录ID，在一个事务中批量删除
+            record_ids = [self._record_at_row(index.row())['id'] for index in selected_rows]
+            self.db.delete_downloads(record_ids)
+            self.delete_history_requested.emit(record_ids)
             
             # 重新加载列表
             self.load_download_history()
@@ -458,49 +883,48 @@ class DownloadHistoryPage(QWidget):
         details = QTextEdit()
         details.setReadOnly(True)
         
-        # 格式化详情文本
-        html = f"""
-        <h2>{record['title']}</h2>
-        <p><b>视频ID:</b> {record['video_id'] or '未知'}</p>
-        <p><b>URL:</b> <a href="{record['url']}">{record['url']}</a></p>
-        <p><b>状态:</b> {record['status']}</p>
-        """
+        # 逐段生成详情HTML，最后一次拼接；用户数据全部转义
+        parts = [
+            f"<h2>{html_escape(record['title'])}</h2>",
+            f"<p><b>视频ID:</b> {html_escape(record['video_id'] or '未知')}</p>",
+            f"<p><b>URL:</b> <a href=\"{html_escape(record['url'])}\">{html_escape(record['url'])}</a></p>",
+            f"<p><b>状态:</b> {html_escape(record['status'])}</p>",
+        ]
         
         if record['video_format'] or record['audio_format']:
-            html += "<p><b>下载格式:</b> "
+            formats = []
             if record['video_format']:
-                html += f"视频: {record['video_format']} "
+                formats.append(f"视频: {html_escape(record['video_format'])}")
             if record['audio_format']:
-                html += f"音频: {record['audio_format']}"
-            html += "</p>"
+                formats.append(f"音频: {html_escape(record['audio_format'])}")
+            parts.append(f"<p><b>下载格式:</b> {' '.join(formats)}</p>")
         
         if record['subtitles']:
-            html += f"<p><b>字幕:</b> {record['subtitles']}</p>"
+            parts.append(f"<p><b>字幕:</b> {html_escape(record['subtitles'])}</p>")
             
-        if record.get('subtitle_path') and os.path.exists(record.get('subtitle_path')):
-            html += f"<p><b>字幕文件:</b> {record.get('subtitle_path')}</p>"
+        if file_exists(record.get('subtitle_path')):
+            parts.append(f"<p><b>字幕文件:</b> {html_escape(record['subtitle_path'])}</p>")
         
         if record['output_path']:
-            html += f"<p><b>输出路径:</b> {record['output_path']}</p>"
+            parts.append(f"<p><b>输出路径:</b> {html_escape(record['output_path'])}</p>")
         
         if record['file_size']:
-            html += f"<p><b>文件大小:</b> {self.format_size(record['file_size'])}</p>"
+            parts.append(f"<p><b>文件大小:</b> {format_size(record['file_size'])}</p>")
         
         # 时间信息
         if record['start_time']:
-            start_time_str = datetime.datetime.fromtimestamp(record['start_time']).strftime("%Y-%m-%d %H:%M:%S")
-            html += f"<p><b>开始时间:</b> {start_time_str}</p>"
+            parts.append(f"<p><b>开始时间:</b> {format_timestamp(record['start_time'])}</p>")
         
         if record['end_time']:
-            end_time_str = datetime.datetime.fromtimestamp(record['end_time']).strftime("%Y-%m-%d %H:%M:%S")
-            html += f"<p><b>结束时间:</b> {end_time_str}</p>"
+            parts.append(f"<p><b>结束时间:</b> {format_timestamp(record['end_time'])}</p>")
         
         if record['duration']:
-            html += f"<p><b>耗时:</b> {self.format_duration(record['duration'])}</p>"
+            parts.append(f"<p><b>耗时:</b> {format_duration(record['duration'])}</p>")
         
         if record['error_message']:
-            html += f"""<p><b>错误信息:</b> <span style="color: red;">{record['error_message']}</span></p>"""
+            parts.append(f"""<p><b>错误信息:</b> <span style="color: red;">{html_escape(record['error_message'])}</span></p>""")
         
+        html = "".join(parts)
         details.setHtml(html)
         layout.addWidget(details)
         
@@ -513,28 +937,11 @@ class DownloadHistoryPage(QWidget):
     
     def format_size(self, size_bytes):
         """格式化文件大小"""
-        if size_bytes < 1024:
-            return f"{size_bytes} B"
-        elif size_bytes < 1024 * 1024:
-            return f"{size_bytes/1024:.2f} KB"
-        elif size_bytes < 1024 * 1024 * 1024:
-            return f"{size_bytes/(1024*1024):.2f} MB"
-        else:
-            return f"{size_bytes/(1024*1024*1024):.2f} GB"
+        return format_size(size_bytes)
     
     def format_duration(self, seconds):
         """格式化持续时间"""
-        if seconds < 60:
-            return f"{seconds}秒"
-        elif seconds < 3600:
-            minutes = seconds // 60
-            secs = seconds % 60
-            return f"{minutes}分{secs}秒"
-        else:
-            hours = seconds // 3600
-            minutes = (seconds % 3600) // 60
-            secs = seconds % 60
-            return f"{hours}时{minutes}分{secs}秒"
+        return format_duration(seconds)
     
     def on_redownload_triggered(self, record):
         """处理重新下载请求"""
@@ -590,118 +997,17 @@ class DownloadHistoryPage(QWidget):
             if reply == QMessageBox.StandardButton.No:
                 return
         
-        # 使用新的转换函数代替创建转换对话框
-        from src.utils.video_utils import convert_video
-        
-        # 创建转换对话框，显示进度
-        dialog = QDialog(self)
-        dialog.setWindowTitle("视频格式转换")
-        dialog.setMinimumWidth(400)
-        
-        # 设置对话框UI
-        layout = QVBoxLayout(dialog)
-        
-        # 标题和文件名
-        title_label = QLabel("<b>正在将WebM文件转换为MP4格式</b>")
-        title_label.setAlignment(Qt.AlignCenter)
-        
-        # 显示文件名
-        file_name = os.path.basename(webm_path)
-        file_label = QLabel(f"文件: {file_name}")
-        
-        # 进度条
-        progress_bar = QProgressBar()
-        progress_bar.setRange(0, 100)
-        progress_bar.setValue(0)
-        
-        # 状态标签
-        status_label = QLabel("准备转换...")
-        status_label.setWordWrap(True)
-        
-        # 按钮
-        button_layout = QHBoxLayout()
-        cancel_button = QPushButton("取消")
-        close_button = QPushButton("关闭")
-        close_button.setEnabled(False)  # 转换完成前禁用
-        
-        button_layout.addWidget(cancel_button)
-        button_layout.addWidget(close_button)
-        
-        # 添加所有元素到布局
-        layout.addWidget(title_label)
-        layout.addWidget(file_label)
-        layout.addWidget(progress_bar)
-        layout.addWidget(status_label)
-        layout.addLayout(button_layout)
-        
-        # 设置对话框模式和大小
-        dialog.setModal(True)
-        dialog.resize(450, 200)
-        
-        # 调用转换需要的回调函数
-        conversion_cancelled = [False]  # 用于跟踪取消状态
-        
-        def progress_callback(percent, message):
-            # 更新进度条
-            progress_bar.setValue(percent)
-            
-            # 更新状态标签，格式化显示信息
-            if "转换中" in message or "%" in message:
-                status_label.setText(f"转换进度: {percent}%")
-            else:
-                status_label.setText(message)
-                
-            # 确保UI及时更新
-            QApplication.processEvents()
-            
-            # 如果取消标志被设置，返回False
-            return not conversion_cancelled[0]
-        
-        def finished_callback(success, message, file_path):
-            # 更新进度条
-            progress_bar.setValue(100 if success else 0)
-            
-            # 更新状态标签
-            if success:
-                status_label.setText("转换完成！")
-                title_label.setText("<b>转换完成</b>")
-            else:
-                status_label.setText(f"转换失败: {message}")
-                title_label.setText("<b>转换失败</b>")
-            
-            # 更新按钮状态
-            cancel_button.setEnabled(False)
-            close_button.setEnabled(True)
-            
-            # 转换后刷新列表
-            self.load_download_history()
-        
-        # 连接取消和关闭按钮信号
-        def on_cancel_clicked():
-            conversion_cancelled[0] = True
-            cancel_button.setEnabled(False)
-            status_label.setText("正在取消转换...")
-            progress_bar.setRange(0, 0)  # 设置为未确定状态
-            
-        def on_close_clicked():
-            dialog.close()
-            
-        cancel_button.clicked.connect(on_cancel_clicked)
-        close_button.clicked.connect(on_close_clicked)
-        
-        # 显示对话框
-        dialog.show()
-        
-        # 启动转换（在对话框显示后）
-        convert_video(
-            file_path=webm_path,
-            record_id=record['id'],
-            progress_callback=progress_callback,
-            finished_callback=finished_callback
+        # 转换在线程池中执行，进度和结果通过信号排队送回界面线程，
+        # 不再在界面线程中同步转换并反复调用processEvents
+        # 转换日志同时写入主窗口的日志区域
+        dialog = ConvertDialog(
+            webm_path, self, record_id=record['id'],
+            log_sink=getattr(self.window(), 'log_message', None)
         )
-        
-        # 执行对话框
         dialog.exec()
+        
+        # 转换后刷新列表
+        self.load_download_history()
     
     def on_translate_subtitle_triggered(self, record):
         """翻译字幕"""
@@ -709,19 +1015,12 @@ class DownloadHistoryPage(QWidget):
             return
             
         # 检查输出路径是否存在
-        if not record['output_path'] or not os.path.exists(record['output_path']):
+        if not file_exists(record['output_path']):
             QMessageBox.warning(self, "无法翻译", "视频文件不存在，无法找到对应的字幕文件")
             return
         
         # 查找可能的字幕文件
-        video_dir = os.path.dirname(record['output_path'])
-        video_name = os.path.splitext(os.path.basename(record['output_path']))[0]
-        subtitle_files = []
-        
-        # 查找可能的字幕文件
-        for ext in ['.srt', '.vtt', '.ass']:
-            pattern = os.path.join(video_dir, f"{video_name}*{ext}")
-            subtitle_files.extend(glob.glob(pattern))
+        subtitle_files = find_subtitle_files(record['output_path'])
         
         if not subtitle_files:
             QMessageBox.warning(self, "无法翻译", "未找到字幕文件")
@@ -774,15 +1073,8 @@ class DownloadHistoryPage(QWidget):
         button_layout.addWidget(close_button)
         layout.addLayout(button_layout)
         
-        # 设置状态变量
-        is_translating = [True]
-        is_cancelled = [False]
-        translated_path = [None]
-        
-        # 导入配置和翻译器
+        # 导入配置
         from src.config_manager import ConfigManager
-        from src.utils.subtitle_translator import SubtitleTranslator
-        import threading
         
         # 获取翻译配置
         config = ConfigManager()
@@ -790,101 +1082,71 @@ class DownloadHistoryPage(QWidget):
         n8n_workflow_url = config.get("Subtitle", "n8n_workflow_url", fallback="http://localhost:5678/webhook/translate")
         force_translate_traditional = config.getboolean("Subtitle", "force_translate_traditional", fallback=True)
         
-        # 更新进度信息的回调函数
+        # 翻译在全局线程池中执行，进度和结果通过信号排队送回界面线程
+        translate_thread = TranslateThread(
+            selected_subtitle,
+            n8n_workflow_url,
+            force_translate_traditional=force_translate_traditional,
+            use_n8n=use_n8n
+        )
+        translated_path = [None]
+        
+        # 更新进度信息
         def update_progress(percent, message):
-            if not is_cancelled[0]:
+            if not translate_thread.cancel_event.is_set():
                 progress_bar.setValue(percent)
                 detail_label.setText(message)
         
-        # 翻译完成的回调函数
-        def translation_finished(success, message, path=None):
-            is_translating[0] = False
-            if not is_cancelled[0]:
-                if success:
-                    translated_path[0] = path
-                    status_label.setText("翻译完成")
-                    detail_label.setText(f"翻译结果保存在: {path}")
-                    progress_bar.setValue(100)
-                    
-                    # 更新数据库中的字幕路径
-                    self.db.update_subtitle_path(record.get('id'), path)
-                    
-                    # 移除成功弹窗，只在对话框中显示状态
-                else:
-                    status_label.setText("翻译失败")
-                    detail_label.setText(message)
-                    # 失败时也不显示额外弹窗
+        # 翻译完成
+        def translation_finished(success, message, path):
+            # 取消时界面已经结束，之后到达的结果直接忽略
+            if translate_thread.cancel_event.is_set():
+                return
+            if success:
+                translated_path[0] = path
+                status_label.setText("翻译完成")
+                detail_label.setText(f"翻译结果保存在: {path}")
+                progress_bar.setValue(100)
+                
+                # 更新数据库中的字幕路径，交给后台写入线程与其它状态更新合并提交
+                db_writer.enqueue(
+                    'update_subtitle_path',
+                    record_id=record.get('id'),
+                    subtitle_path=path
+                )
+            else:
+                status_label.setText("翻译失败")
+                detail_label.setText(message)
             
             # 启用关闭按钮，禁用取消按钮
             cancel_button.setEnabled(False)
             close_button.setEnabled(True)
         
-        # 进行翻译的函数
-        def do_translate():
-            try:
-                # 初始化翻译器
-                translator = SubtitleTranslator(
-                    translation_api_url=n8n_workflow_url,
-                    force_translate_traditional=force_translate_traditional,
-                    use_n8n=use_n8n
-                )
-                
-                # 更新进度
-                update_progress(10, "检测字幕语言...")
-                
-                # 检测字幕语言
-                is_chinese, is_traditional = translator.is_chinese_subtitle(selected_subtitle)
-                
-                # 根据检测结果更新进度
-                if is_chinese and not is_traditional:
-                    update_progress(100, "字幕已经是简体中文，无需翻译")
-                    translation_finished(True, "字幕已经是简体中文，无需翻译", selected_subtitle)
-                    return
-                
-                # 更新进度
-                if is_chinese and is_traditional:
-                    update_progress(20, "检测到繁体中文字幕，开始翻译...")
-                else:
-                    update_progress(20, "检测到外语字幕，开始翻译...")
-                
-                # 进行翻译
-                if is_cancelled[0]:
-                    return
-                    
-                update_progress(30, "正在翻译字幕，这可能需要一些时间...")
-                translated_path = translator.translate(selected_subtitle)
-                
-                if translated_path and translated_path != selected_subtitle:
-                    update_progress(90, "翻译完成，正在保存...")
-                    translation_finished(True, "翻译完成", translated_path)
-                else:
-                    translation_finished(False, "翻译失败，请检查网络连接或服务配置")
-            except Exception as e:
-                import traceback
-                error_details = traceback.format_exc()
-                translation_finished(False, f"翻译过程中出错: {str(e)}\n\n{error_details}")
-        
         # 取消按钮点击事件
         def on_cancel_clicked():
-            is_cancelled[0] = True
-            status_label.setText("正在取消...")
+            # 已发出的请求由后台任务在返回后丢弃结果，对话框不必等待
+            translate_thread.cancel()
+            status_label.setText("翻译已取消")
+            detail_label.setText("")
             cancel_button.setEnabled(False)
-            # 不能真正取消正在进行的HTTP请求，但可以停止后续处理
-        
-        # 关闭按钮点击事件
-        def on_close_clicked():
-            progress_dialog.accept()
+            close_button.setEnabled(True)
         
-        # 连接按钮信号
+        # 连接信号和按钮
+        translate_thread.signals.progress.connect(update_progress, Qt.ConnectionType.QueuedConnection)
+        translate_thread.signals.finished.connect(translation_finished, Qt.ConnectionType.QueuedConnection)
         cancel_button.clicked.connect(on_cancel_clicked)
-        close_button.clicked.connect(on_close_clicked)
+        close_button.clicked.connect(progress_dialog.accept)
         
-        # 在新线程中执行翻译
-        threading.Thread(target=do_translate, daemon=True).start()
+        translate_thread.start()
         
         # 显示对话框
         progress_dialog.exec()
         
+        # 对话框关闭时翻译可能仍在进行，保留任务引用直到run()退出
+        if translate_thread.is_running():
+            self._translate_threads = [t for t in self._translate_threads if t.is_running()]
+            self._translate_threads.append(translate_thread)
+        
         # 如果翻译成功，重新加载历史记录
         if translated_path[0]:
             self.load_download_history()
@@ -905,14 +1167,23 @@ class DownloadHistoryPage(QWidget):
         if hasattr(self, 'refresh_timer') and self.refresh_timer.isActive():
             self.refresh_timer.stop()
     
+    def _record_at_row(self, row):
+        """获取表格某一行在加载时缓存的记录
+        
+        Args:
+            row: 表格行号
+            
+        Returns:
+            dict: 下载记录，行不存在时返回None
+        """
+        return self.history_model.record(row)
+    
     def get_selected_record_id(self):
         """获取当前选中行的记录ID"""
         selected_rows = self.history_table.selectionModel().selectedRows()
         if not selected_rows:
             return None
         
-        row = selected_rows[0].row()
-        # 直接从ID列获取记录ID (索引0)
-        id_item = self.history_table.item(row, 0)
-        if id_item:
-            return int(id_item.text()) 
\ No newline at end of file
+        record = self._record_at_row(selected_rows[0].row())
+        if record:
+            return record['id']
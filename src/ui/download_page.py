@@ -2,16 +2,35 @@ from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout,
                         QLabel, QLineEdit, QPushButton, QComboBox, 
                         QListWidget, QListWidgetItem, QGroupBox, QProgressBar, QMessageBox,
                         QApplication)
-from PySide6.QtCore import Qt, Signal, Slot, QTimer
-from PySide6.QtGui import QPixmap, QImage
-import requests
+from PySide6.QtCore import Qt, Signal, Slot, QTimer, QUrl
+from PySide6.QtGui import QPixmap, QImage, QPixmapCache
+from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 import subprocess
 import os
+import time
 import logging
 from src.utils.video_utils import convert_webm_to_mp4
-from src.threads import ConvertThread  # 导入新的转换线程类
-from src.db.download_history import DownloadHistoryDB
+from src.threads import ThumbnailLoader
 import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def _batch_update(*widgets):
+    """批量修改控件内容期间暂停信号和重绘，结束后恢复并统一刷新
+    
+    Args:
+        *widgets: 要批量修改的控件
+    """
+    for widget in widgets:
+        widget.setUpdatesEnabled(False)
+        widget.blockSignals(True)
+    try:
+        yield
+    finally:
+        for widget in widgets:
+            widget.blockSignals(False)
+            widget.setUpdatesEnabled(True)
 
 
 class DownloadPage(QWidget):
@@ -25,6 +44,10 @@ class DownloadPage(QWidget):
         self.video_info = None
         self.thumbnail_url = None
         self.thumbnail_data = None
+        self.network_manager = QNetworkAccessManager(self)  # 异步下载封面，不阻塞界面线程
+        self._thumbnail_reply = None  # 正在进行的封面请求，新请求发出后旧的结果直接丢弃
+        self._thumbnail_url = None  # 当前应显示的封面URL，其它URL的加载结果直接丢弃
+        self._thumbnail_loaders = []  # 尚未结束的封面解码任务
         self.loading_timer = None
         self.loading_dots = 0
         self.preset_video_format = None  # 预设视频格式
@@ -297,7 +320,7 @@ class DownloadPage(QWidget):
     def on_cancel_button_clicked(self):
         """取消按钮点击处理"""
         # 如果在下载过程中
-        if hasattr(self, 'download_thread') and self.download_thread and self.download_thread.isRunning():
+        if hasattr(self, 'download_thread') and self.download_thread and self.download_thread.is_running():
             reply = QMessageBox.question(
                 self, "确认取消", 
                 "确定要取消当前下载吗？",
@@ -360,6 +383,106 @@ class DownloadPage(QWidget):
         self.fetch_button.setEnabled(True)
         self.cancel_fetch_button.setEnabled(False)
     
+    def load_thumbnail(self, url):
+        """显示封面，解码和缩放在线程池中完成，缓存未命中时再异步下载
+        
+        Args:
+            url: 封面图片URL，为空时显示"无封面"
+        """
+        # 放弃上一个视频尚未完成的封面请求
+        previous_reply, self._thumbnail_reply = self._thumbnail_reply, None
+        if previous_reply is not None:
+            previous_reply.abort()
+        self.thumbnail_data = None
+        self._thumbnail_url = url
+        
+        if not url:
+            self.thumbnail_label.setText("无封面")
+            self.thumbnail_label.setStyleSheet("color: #888888;")
+            return
+        
+        # 已缩放好的封面直接从全局QPixmapCache取出，无需再读盘解码
+        pixmap = QPixmapCache.find(self._thumbnail_cache_key(url))
+        if pixmap is not None and not pixmap.isNull():
+            self.thumbnail_label.setPixmap(pixmap)
+            self.thumbnail_label.setStyleSheet("")
+            return
+        
+        self.thumbnail_label.setText("正在加载封面...")
+        self.thumbnail_label.setStyleSheet("color: #888888;")
+        
+        # 先查缓存，没有时由_on_thumbnail_missing发起下载
+        self._start_thumbnail_loader(url)
+    
+    def _thumbnail_cache_key(self, url):
+        """封面在QPixmapCache中的键，包含显示尺寸"""
+        return f"thumbnail:{self.thumbnail_label.width()}x{self.thumbnail_label.height()}:{url}"
+    
+    def _start_thumbnail_loader(self, url, data=None):
+        """提交封面解码缩放任务
+        
+        Args:
+            url: 封面图片URL
+            data: 刚下载的原始图片数据，为None时从缓存读取
+        """
+        # 只保留仍在运行的任务引用，保证其run()完全退出前不被回收
+        self._thumbnail_loaders = [loader for loader in self._thumbnail_loaders if loader.is_running()]
+        
+        loader = ThumbnailLoader(url, data, self.thumbnail_label.width(), self.thumbnail_label.height())
+        loader.signals.loaded.connect(self._on_thumbnail_loaded)
+        loader.signals.missing.connect(self._on_thumbnail_missing)
+        loader.signals.load_error.connect(self._on_thumbnail_error)
+        self._thumbnail_loaders.append(loader)
+        loader.start()
+    
+    def _on_thumbnail_missing(self, url):
+        """缓存中没有封面，异步下载"""
+        if url != self._thumbnail_url:
+            return
+        
+        reply = self.network_manager.get(QNetworkRequest(QUrl(url)))
+        reply.finished.connect(lambda: self._on_thumbnail_finished(reply, url))
+        self._thumbnail_reply = reply
+    
+    def _on_thumbnail_finished(self, reply, url):
+        """封面下载结束，交给后台任务解码缩放并写入缓存
+        
+        Args:
+            reply: 完成的网络请求
+            url: 请求的封面URL，作为缓存的键
+        """
+        reply.deleteLater()
+        
+        # 已被新请求取代的结果直接丢弃
+        if reply is not self._thumbnail_reply:
+            return
+        self._thumbnail_reply = None
+        
+        if reply.error() != QNetworkReply.NetworkError.NoError:
+            logging.warning(f"加载封面失败: {reply.errorString()}")
+            self.thumbnail_label.setText(f"加载封面失败: {reply.errorString()}")
+            self.thumbnail_label.setStyleSheet("color: #888888;")
+            return
+        
+        self.thumbnail_data = bytes(reply.readAll())
+        self._start_thumbnail_loader(url, self.thumbnail_data)
+    
+    def _on_thumbnail_loaded(self, url, image):
+        """显示后台缩放好的封面"""
+        pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(self._thumbnail_cache_key(url), pixmap)
+        if url != self._thumbnail_url:
+            return
+        self.thumbnail_label.setPixmap(pixmap)
+        self.thumbnail_label.setStyleSheet("")
+    
+    def _on_thumbnail_error(self, url):
+        """封面无法解码"""
+        if url != self._thumbnail_url:
+            return
+        self.thumbnail_label.setText("无法加载封面")
+        self.thumbnail_label.setStyleSheet("color: #888888;")
+    
     def update_video_info(self):
         """更新视频信息显示"""
         if not self.video_info:
@@ -371,9 +494,11 @@ class DownloadPage(QWidget):
         
         duration = self.video_info.get('duration')
         if duration:
-            minutes, seconds = divmod(duration, 60)
-            hours, minutes = divmod(minutes, 60)
-            duration_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+            # 分秒由time.strftime格式化，超过一小时时再加上小时位；时长可能是浮点数
+            total_seconds = int(duration)
+            duration_str = time.strftime("%M:%S", time.gmtime(total_seconds))
+            if total_seconds >= 3600:
+                duration_str = f"{total_seconds // 3600:02d}:{duration_str}"
             self.duration_label.setText(f"<b>时长:</b> {duration_str}")
         else:
             self.duration_label.setText("<b>时长:</b> 未知")
@@ -383,112 +508,99 @@ class DownloadPage(QWidget):
         
         # 加载封面
         self.thumbnail_url = self.video_info.get('thumbnail')
-        if self.thumbnail_url:
-            try:
-                response = requests.get(self.thumbnail_url, stream=True)
-                if response.status_code == 200:
-                    self.thumbnail_data = response.content
-                    pixmap = QPixmap()
-                    pixmap.loadFromData(self.thumbnail_data)
-                    pixmap = pixmap.scaled(360, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    self.thumbnail_label.setPixmap(pixmap)
-                    self.thumbnail_label.setStyleSheet("")
-                else:
-                    self.thumbnail_label.setText("无法加载封面")
-                    self.thumbnail_label.setStyleSheet("color: #888888;")
-            except Exception as e:
-                self.thumbnail_label.setText(f"加载封面失败: {str(e)}")
-                self.thumbnail_label.setStyleSheet("color: #888888;")
-        else:
-            self.thumbnail_label.setText("无封面")
-            self.thumbnail_label.setStyleSheet("color: #888888;")
-        
-        # 清空和更新格式选择
-        self.video_format_combo.clear()
-        self.audio_format_combo.clear()
-        
-        # 添加"不下载视频"选项
-        self.video_format_combo.addItem("不下载视频", "")
-        
-        # 添加"不下载音频"选项
-        self.audio_format_combo.addItem("不下载音频", "")
+        self.load_thumbnail(self.thumbnail_url)
         
-        # 获取并排序视频和音频格式
-        video_formats = []
-        audio_formats = []
-        
-        # 提取视频和音频格式信息
-        for fmt in self.video_info.get('formats', []):
-            format_id = fmt.get('format_id', '')
-            # 忽略最佳格式
-            if format_id == 'best' or format_id == 'worst':
-                continue
-                
-            ext = fmt.get('ext', '')
-            format_note = fmt.get('format_note', '')
+        # 批量填充下拉框和字幕列表期间暂停信号和重绘，填充完成后只刷新一次
+        with _batch_update(self.video_format_combo, self.audio_format_combo, self.subtitle_list):
+            # 清空和更新格式选择
+            self.video_format_combo.clear()
+            self.audio_format_combo.clear()
             
-            # 检查是否有视频或音频流
-            is_video = fmt.get('vcodec', 'none') != 'none'
-            is_audio = fmt.get('acodec', 'none') != 'none'
+            # 添加"不下载视频"选项
+            self.video_format_combo.addItem("不下载视频", "")
             
-            if is_video and not is_audio:
-                # 纯视频流
-                resolution = fmt.get('resolution', 'unknown')
-                fps = fmt.get('fps', '')
-                fps_str = f" {fps}fps" if fps else ""
-                vcodec = fmt.get('vcodec', 'unknown')
-                bitrate = fmt.get('tbr', 0)
-                bitrate_str = f" {int(bitrate)}kbps" if bitrate else ""
-                
-                format_display = f"{resolution}{fps_str} [{ext}] ({format_note}{bitrate_str} - {vcodec})"
-                video_formats.append((format_id, format_display, fmt.get('filesize', 0), resolution))
+            # 添加"不下载音频"选项
+            self.audio_format_combo.addItem("不下载音频", "")
+            
+            # 获取并排序视频和音频格式
+            video_formats = []
+            audio_formats = []
             
-            elif is_audio and not is_video:
-                # 纯音频流
-                acodec = fmt.get('acodec', 'unknown')
-                bitrate = fmt.get('abr', 0) or fmt.get('tbr', 0)
-                bitrate_str = f" {int(bitrate)}kbps" if bitrate else ""
+            # 提取视频和音频格式信息，一次遍历同时分出视频和音频，每个字段只读取一次
+            for fmt in self.video_info.get('formats', []):
+                get = fmt.get
+                format_id = get('format_id', '')
+                # 忽略最佳格式
+                if format_id == 'best' or format_id == 'worst':
+                    continue
                 
-                format_display = f"{format_note}{bitrate_str} [{ext}] ({acodec})"
-                audio_formats.append((format_id, format_display, fmt.get('filesize', 0)))
-        
-        # 对视频格式按分辨率排序（从高到低）
-        video_formats.sort(key=lambda x: (0 if isinstance(x[3], str) else x[3]), reverse=True)
-        
-        # 对音频格式按文件大小排序（从大到小，假设更大意味着更高质量）
-        audio_formats.sort(key=lambda x: x[2] or 0, reverse=True)
-        
-        # 添加视频格式到下拉框
-        preset_video_index = 0
-        for i, (format_id, format_display, _, _) in enumerate(video_formats):
-            self.video_format_combo.addItem(format_display, format_id)
-            # 如果有预设格式且匹配当前格式ID，记录索引
-            if self.preset_video_format and format_id == self.preset_video_format:
-                preset_video_index = i + 1  # +1 因为我们添加了"不下载视频"选项
-        
-        # 添加音频格式到下拉框
-        preset_audio_index = 0
-        for i, (format_id, format_display, _) in enumerate(audio_formats):
-            self.audio_format_combo.addItem(format_display, format_id)
-            # 如果有预设格式且匹配当前格式ID，记录索引
-            if self.preset_audio_format and format_id == self.preset_audio_format:
-                preset_audio_index = i + 1  # +1 因为我们添加了"不下载音频"选项
-        
-        # 清空并更新字幕列表
-        self.subtitle_list.clear()
-        preset_subtitle_indices = []
-        
-        # 添加字幕选项
-        subtitles = self.video_info.get('subtitles', {})
-        for i, (lang_code, _) in enumerate(subtitles.items()):
-            display_name = f"{lang_code}"
-            item = QListWidgetItem(display_name)
-            item.setData(Qt.UserRole, lang_code)
-            self.subtitle_list.addItem(item)
+                # 检查是否有视频或音频流
+                vcodec = get('vcodec', 'none')
+                acodec = get('acodec', 'none')
+                is_video = vcodec != 'none'
+                is_audio = acodec != 'none'
+                if is_video == is_audio:
+                    # 音视频合并流或两者都没有的格式不列出
+                    continue
+                
+                ext = get('ext', '')
+                format_note = get('format_note', '')
+                
+                if is_video:
+                    # 纯视频流
+                    resolution = get('resolution', 'unknown')
+                    fps = get('fps', '')
+                    fps_str = f" {fps}fps" if fps else ""
+                    bitrate = get('tbr', 0)
+                    bitrate_str = f" {int(bitrate)}kbps" if bitrate else ""
+                    
+                    format_display = f"{resolution}{fps_str} [{ext}] ({format_note}{bitrate_str} - {vcodec})"
+                    video_formats.append((format_id, format_display, get('filesize', 0), resolution))
+                else:
+                    # 纯音频流
+                    bitrate = get('abr', 0) or get('tbr', 0)
+                    bitrate_str = f" {int(bitrate)}kbps" if bitrate else ""
+                    
+                    format_display = f"{format_note}{bitrate_str} [{ext}] ({acodec})"
+                    audio_formats.append((format_id, format_display, get('filesize', 0)))
             
-            # 如果有预设字幕且匹配当前语言，记录索引
-            if self.preset_subtitles and lang_code in self.preset_subtitles:
-                preset_subtitle_indices.append(i)
+            # 对视频格式按分辨率排序（从高到低）
+            video_formats.sort(key=lambda x: (0 if isinstance(x[3], str) else x[3]), reverse=True)
+            
+            # 对音频格式按文件大小排序（从大到小，假设更大意味着更高质量）
+            audio_formats.sort(key=lambda x: x[2] or 0, reverse=True)
+            
+            # 添加视频格式到下拉框
+            preset_video_index = 0
+            for i, (format_id, format_display, _, _) in enumerate(video_formats):
+                self.video_format_combo.addItem(format_display, format_id)
+                # 如果有预设格式且匹配当前格式ID，记录索引
+                if self.preset_video_format and format_id == self.preset_video_format:
+                    preset_video_index = i + 1  # +1 因为我们添加了"不下载视频"选项
+            
+            # 添加音频格式到下拉框
+            preset_audio_index = 0
+            for i, (format_id, format_display, _) in enumerate(audio_formats):
+                self.audio_format_combo.addItem(format_display, format_id)
+                # 如果有预设格式且匹配当前格式ID，记录索引
+                if self.preset_audio_format and format_id == self.preset_audio_format:
+                    preset_audio_index = i + 1  # +1 因为我们添加了"不下载音频"选项
+            
+            # 清空并更新字幕列表
+            self.subtitle_list.clear()
+            preset_subtitle_indices = []
+            
+            # 添加字幕选项
+            subtitles = self.video_info.get('subtitles', {})
+            for i, (lang_code, _) in enumerate(subtitles.items()):
+                display_name = f"{lang_code}"
+                item = QListWidgetItem(display_name)
+                item.setData(Qt.UserRole, lang_code)
+                self.subtitle_list.addItem(item)
+                
+                # 如果有预设字幕且匹配当前语言，记录索引
+                if self.preset_subtitles and lang_code in self.preset_subtitles:
+                    preset_subtitle_indices.append(i)
         
         # 启用控件
         self.video_format_combo.setEnabled(True)
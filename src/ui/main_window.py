@@ -22,7 +22,7 @@ from src.downloader import YtDownloader
 from src.config import UI_MIN_WIDTH, UI_MIN_HEIGHT, APP_NAME, TEMP_DIR, DOWNLOADS_DIR
 from src.config_manager import ConfigManager
 from src.utils.video_utils import clean_old_files
-from src.db.download_history import DownloadHistoryDB
+from src.db.download_history import get_db
 
 
 class MainWindow(QMainWindow):
@@ -199,8 +199,8 @@ class MainWindow(QMainWindow):
         
         # 使用线程异步获取视频信息
         self.fetch_thread = FetchInfoThread(self.downloader, url, use_cookies, browser)
-        self.fetch_thread.info_fetched.connect(self.on_info_fetched)
-        self.fetch_thread.fetch_error.connect(self.on_fetch_error)
+        self.fetch_thread.signals.info_fetched.connect(self.on_info_fetched)
+        self.fetch_thread.signals.fetch_error.connect(self.on_fetch_error)
         self.fetch_thread.start()
     
     @Slot(dict)
@@ -279,17 +279,18 @@ class MainWindow(QMainWindow):
             use_cookies,
             browser,
             video_info,  # 传递视频信息
-            resume  # 传递断点续传参数
+            resume,  # 传递断点续传参数
+            main_window=self
         )
         
-        self.download_thread.progress_updated.connect(self.update_download_progress)
-        self.download_thread.download_finished.connect(self.download_complete)
+        self.download_thread.signals.progress_updated.connect(self.update_download_progress)
+        self.download_thread.signals.download_finished.connect(self.download_complete)
         self.download_thread.start()
     
     @Slot()
     def cancel_download(self):
         """取消当前下载任务"""
-        if hasattr(self, 'download_thread') and self.download_thread.isRunning():
+        if hasattr(self, 'download_thread') and self.download_thread.is_running():
             # 调用下载线程的取消方法
             self.download_thread.cancel()
             self.log_message("用户取消下载")
@@ -314,18 +315,18 @@ class MainWindow(QMainWindow):
         if hasattr(self, 'download_thread') and self.download_thread:
             # 断开旧的连接
             try:
-                self.download_thread.convert_progress.disconnect()
+                self.download_thread.signals.convert_progress.disconnect()
             except:
                 pass
             
             try:
-                self.download_thread.convert_finished.disconnect()
+                self.download_thread.signals.convert_finished.disconnect()
             except:
                 pass
             
             # 连接转换信号
-            self.download_thread.convert_progress.connect(self.on_convert_progress_new)
-            self.download_thread.convert_finished.connect(self.on_convert_finished)
+            self.download_thread.signals.convert_progress.connect(self.on_convert_progress_new)
+            self.download_thread.signals.convert_finished.connect(self.on_convert_finished)
         
         # 调用下载页面的下载完成处理
         self.download_page.download_complete(success, message)
@@ -425,21 +426,21 @@ class MainWindow(QMainWindow):
             if hasattr(self, 'download_thread') and self.download_thread:
                 try:
                     # 先检查是否有连接，然后再尝试断开特定的连接
-                    if hasattr(self, 'on_convert_progress_new') and hasattr(self.download_thread, 'convert_progress'):
+                    if hasattr(self, 'on_convert_progress_new'):
                         try:
                             # 先检查是否有连接信号
-                            if self.download_thread.convert_progress.receivers(self.on_convert_progress_new) > 0:
-                                self.download_thread.convert_progress.disconnect(self.on_convert_progress_new)
+                            if self.download_thread.signals.receivers(self.download_thread.signals.convert_progress) > 0:
+                                self.download_thread.signals.convert_progress.disconnect(self.on_convert_progress_new)
                         except Exception:
                             pass
                 except Exception:
                     pass
                 
                 try:
-                    if hasattr(self, 'on_convert_finished') and hasattr(self.download_thread, 'convert_finished'):
+                    if hasattr(self, 'on_convert_finished'):
                         try:
-                            if self.download_thread.convert_finished.receivers(self.on_convert_finished) > 0:
-                                self.download_thread.convert_finished.disconnect(self.on_convert_finished)
+                            if self.download_thread.signals.receivers(self.download_thread.signals.convert_finished) > 0:
+                                self.download_thread.signals.convert_finished.disconnect(self.on_convert_finished)
                         except Exception:
                             pass
                 except Exception:
@@ -476,15 +477,12 @@ class MainWindow(QMainWindow):
     @Slot()
     def cancel_fetch_info(self):
         """取消获取视频信息"""
-        if hasattr(self, 'fetch_thread') and self.fetch_thread.isRunning():
+        if hasattr(self, 'fetch_thread') and self.fetch_thread.is_running():
             # 记录日志
             self.log_message("用户取消获取视频信息")
             
-            # 尝试终止下载器中的进程
-            self.downloader.cancel_download()
-            # 终止线程
-            self.fetch_thread.terminate()
-            self.fetch_thread.wait()
+            # 终止下载器中的进程，任务结束后不会再发送信号
+            self.fetch_thread.cancel()
     
     def on_debug_message(self, message):
         """接收来自下载器的调试消息"""
@@ -617,8 +615,12 @@ class MainWindow(QMainWindow):
             logging.error(f"自动清理临时文件失败: {e}")
     
     # 下载历史记录页面相关方法
-    def on_delete_history(self, record_id):
-        """处理删除历史记录请求"""
+    def on_delete_history(self, record_ids):
+        """处理删除历史记录请求
+        
+        Args:
+            record_ids: 被删除的记录ID列表
+        """
         # 这个方法只是接收信号，实际删除工作在下载历史页面内完成
         pass
     
@@ -681,6 +683,7 @@ class MainWindow(QMainWindow):
         # 触发获取视频信息的流程
         self.fetch_video_info(record['url'], False, None)
 
+    @Slot()
     def refresh_download_history(self):
         """刷新下载历史列表"""
         try:
@@ -707,9 +710,8 @@ class MainWindow(QMainWindow):
     def initialize_database(self):
         """初始化并验证下载历史数据库"""
         try:
-            # 初始化数据库
-            from src.db.download_history import DownloadHistoryDB
-            db = DownloadHistoryDB()
+            # 初始化数据库（使用UI线程缓存的连接）
+            db = get_db()
             
             # 验证数据库状态
             result = db.validate_database()
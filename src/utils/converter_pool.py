@@ -0,0 +1,100 @@
+import threading
+
+from src.utils.video_utils import convert_video
+
+# 等待其它转换结束时检查取消标志的间隔（秒）
+WAIT_POLL_INTERVAL = 0.2
+
+# 需要排队等待时发给调用方的进度消息
+WAITING_MESSAGE = "等待其它转换完成..."
+
+
+class ConverterPool:
+    """视频转换互斥器
+    
+    转换在调用方所在的后台线程中执行，但同一时间只允许一个转换运行，
+    下载播放列表时不会让多个ffmpeg进程同时争用GPU编码器。
+    编码器检测结果由detect_encoders在进程内缓存，后续任务无需重新探测。
+    """
+    
+    def __init__(self):
+        # 同一时间只允许一个转换在执行，无论它运行在哪个线程
+        self._convert_lock = threading.Lock()
+    
+    def _acquire(self, cancel_event=None, on_wait=None):
+        """获取转换锁，需要等待时先通知调用方，等待期间定期检查取消标志
+        
+        Args:
+            cancel_event: 调用方的取消标志，设置后放弃等待
+            on_wait: 需要等待其它转换时调用一次的无参回调
+            
+        Returns:
+            bool: 是否获得了锁，等待期间被取消时返回False
+        """
+        if self._convert_lock.acquire(blocking=False):
+            return True
+        
+        if on_wait is not None:
+            on_wait()
+        while not self._convert_lock.acquire(timeout=WAIT_POLL_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+        return True
+    
+    def run_sync(self, fn, *args, cancel_event=None, on_wait=None, **kwargs):
+        """在调用方线程中独占执行一次转换
+        
+        Args:
+            fn: 执行转换的函数
+            *args: 传给fn的位置参数
+            cancel_event: 调用方的取消标志，排队等待期间设置时不再执行fn
+            on_wait: 需要等待其它转换时调用一次的无参回调，用于向界面显示等待状态
+            **kwargs: 传给fn的关键字参数
+        
+        Returns:
+            fn的返回值，等待期间被取消时返回None
+        """
+        if not self._acquire(cancel_event, on_wait):
+            return None
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._convert_lock.release()
+    
+    def submit_sync(self, file_path, record_id=None, progress_callback=None, finished_callback=None, db=None,
+                    cancel_event=None):
+        """在调用方线程中独占执行convert_video
+        
+        Args:
+            file_path: 要转换的文件路径
+            record_id: 数据库记录ID，用于更新状态
+            progress_callback: 进度回调，参数为(percent, message)，返回False表示取消
+            finished_callback: 完成回调，参数为(success, message, file_path)
+            db: 更新状态用的数据库实例，为None时由执行线程自行获取
+            cancel_event: 调用方的取消标志，排队等待期间设置时直接以取消结束
+        
+        Returns:
+            convert_video的返回值
+        """
+        def on_wait():
+            if progress_callback is not None:
+                progress_callback(0, WAITING_MESSAGE)
+        
+        if not self._acquire(cancel_event, on_wait):
+            if finished_callback is not None:
+                finished_callback(False, "转换已取消", file_path)
+            return None
+        try:
+            return convert_video(
+                file_path=file_path,
+                record_id=record_id,
+                progress_callback=progress_callback,
+                finished_callback=finished_callback,
+                db=db
+            )
+        finally:
+            self._convert_lock.release()
+
+
+# 全局共享的转换互斥器实例
+converter_pool = ConverterPool()
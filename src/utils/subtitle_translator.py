@@ -1,11 +1,16 @@
 import os
 import re
 import logging
+import threading
 import chardet
 import requests
 from pathlib import Path
 
 
+# 字幕语言检测结果缓存：(绝对路径, 修改时间, 文件大小) -> (是否为中文, 是否为繁体)
+_detection_cache = {}
+
+
 class SubtitleTranslator:
     """字幕翻译工具，将非中文字幕或繁体中文字幕自动翻译为简体中文"""
     
@@ -21,6 +26,42 @@ class SubtitleTranslator:
         self.force_translate_traditional = force_translate_traditional
         self.use_n8n = use_n8n
         self.logger = logging.getLogger(__name__)
+        self.session = requests.Session()  # 复用连接，取消时可整体关闭
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        """请求取消翻译
+        
+        尚未发出的请求不再发送，已发出请求的结果到达后直接丢弃、不再保存，
+        同时关闭会话中的连接。
+        """
+        self.cancel_event.set()
+        self.session.close()
+    
+    def _post_subtitle(self, subtitle_path):
+        """把字幕文件发送到翻译服务
+        
+        Args:
+            subtitle_path: 字幕文件路径
+            
+        Returns:
+            requests.Response: 服务响应，已取消时返回None
+        """
+        if self.cancel_event.is_set():
+            self.logger.info(f"翻译已取消，不再发送请求: {subtitle_path}")
+            return None
+        
+        with open(subtitle_path, 'rb') as f:
+            response = self.session.post(
+                self.translation_api_url,
+                files={'file': (os.path.basename(subtitle_path), f)},
+                timeout=300  # 设置超时时间为300秒
+            )
+        
+        if self.cancel_event.is_set():
+            self.logger.info(f"翻译已取消，丢弃翻译结果: {subtitle_path}")
+            return None
+        return response
     
     def is_chinese_subtitle(self, subtitle_path):
         """检测字幕文件是否为简体中文
@@ -31,10 +72,30 @@ class SubtitleTranslator:
         Returns:
             tuple: (是否为中文字幕, 是否为繁体中文字幕)
         """
-        if not os.path.exists(subtitle_path):
+        try:
+            st = os.stat(subtitle_path)
+        except OSError:
             self.logger.warning(f"字幕文件不存在: {subtitle_path}")
             return False, False
+        
+        # 文件未修改时直接使用上次的检测结果，避免重复读取和扫描整个文件
+        cache_key = (os.path.abspath(subtitle_path), st.st_mtime_ns, st.st_size)
+        result = _detection_cache.get(cache_key)
+        if result is None:
+            result = self._detect_language(subtitle_path)
+            if result is not None:
+                _detection_cache[cache_key] = result
+        return result or (False, False)
+    
+    def _detect_language(self, subtitle_path):
+        """读取字幕文件内容并检测语言
+        
+        Args:
+            subtitle_path: 字幕文件路径
             
+        Returns:
+            tuple: (是否为中文字幕, 是否为繁体中文字幕)，读取或检测出错时返回None
+        """
         try:
             # 检测文件编码
             with open(subtitle_path, 'rb') as f:
@@ -95,7 +156,7 @@ class SubtitleTranslator:
             
         except Exception as e:
             self.logger.error(f"检测字幕语言时出错: {str(e)}")
-            return False, False
+            return None
     
     def translate(self, subtitle_path):
         """将字幕翻译为简体中文
@@ -132,9 +193,6 @@ class SubtitleTranslator:
             # 使用默认翻译方法
             self.logger.info(f"使用默认翻译方法: {subtitle_path}")
             
-            # 准备请求
-            files = {'file': (os.path.basename(subtitle_path), open(subtitle_path, 'rb'))}
-            
             # 发送翻译请求
             if is_traditional:
                 self.logger.info(f"发送繁体中文翻译请求: {subtitle_path} -> {self.translation_api_url}")
@@ -143,11 +201,9 @@ class SubtitleTranslator:
                 
             self.logger.info(f"开始字幕翻译，这可能需要较长时间，请耐心等待...")
                 
-            response = requests.post(
-                self.translation_api_url, 
-                files=files,
-                timeout=300  # 设置超时时间为300秒
-            )
+            response = self._post_subtitle(subtitle_path)
+            if response is None:
+                return None
             
             # 检查响应
             if response.status_code != 200:
@@ -298,15 +354,10 @@ class SubtitleTranslator:
         try:
             self.logger.info(f"开始通过n8n工作流翻译字幕: {subtitle_path}")
             
-            # 准备请求
-            files = {'file': (os.path.basename(subtitle_path), open(subtitle_path, 'rb'))}
-            
             # 发送翻译请求到n8n工作流
-            response = requests.post(
-                self.translation_api_url, 
-                files=files,
-                timeout=300  # 设置超时时间为300秒
-            )
+            response = self._post_subtitle(subtitle_path)
+            if response is None:
+                return None
             
             # 检查响应
             if response.status_code != 200:
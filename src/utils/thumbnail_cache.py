@@ -0,0 +1,123 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+
+class ThumbnailCache:
+    """视频封面缓存
+    
+    最近使用的封面保存在内存中，所有封面按URL的SHA1保存到磁盘，
+    同一视频再次获取信息时不用重新下载封面。磁盘上的文件超过有效期后视为未命中。
+    """
+    
+    def __init__(self, cache_dir=None, ttl=7 * 24 * 3600, memory_size=32):
+        """初始化封面缓存
+        
+        Args:
+            cache_dir: 磁盘缓存目录，如果为None则使用项目根目录下的data/thumbnails
+            ttl: 磁盘缓存有效期（秒）
+            memory_size: 内存中最多保留的封面数量
+        """
+        if cache_dir is None:
+            project_root = Path(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+            cache_dir = project_root / "data" / "thumbnails"
+        
+        self.cache_dir = str(cache_dir)
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self._memory = OrderedDict()  # URL -> 图片数据，按最近使用排序
+        self._lock = threading.Lock()
+    
+    def path_for(self, url, suffix=".img"):
+        """获取URL对应的磁盘缓存文件路径
+        
+        Args:
+            url: 封面图片URL
+            suffix: 文件扩展名
+            
+        Returns:
+            str: 缓存文件路径
+        """
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + suffix)
+    
+    def is_fresh(self, path):
+        """缓存文件是否存在且未超过有效期
+        
+        Args:
+            path: 缓存文件路径
+            
+        Returns:
+            bool: 文件可以使用时返回True
+        """
+        try:
+            return time.time() - os.path.getmtime(path) <= self.ttl
+        except OSError:
+            return False
+    
+    def get(self, url):
+        """获取缓存的封面数据
+        
+        Args:
+            url: 封面图片URL
+            
+        Returns:
+            bytes: 图片数据，未命中或已过期时返回None
+        """
+        with self._lock:
+            data = self._memory.get(url)
+            if data is not None:
+                self._memory.move_to_end(url)
+                return data
+        
+        path = self.path_for(url)
+        if not self.is_fresh(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        
+        self._remember(url, data)
+        return data
+    
+    def put(self, url, data):
+        """保存封面数据到内存和磁盘
+        
+        Args:
+            url: 封面图片URL
+            data: 图片数据
+        """
+        self._remember(url, data)
+        
+        # 先写临时文件再替换，避免读到写了一半的文件
+        path = self.path_for(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"保存封面缓存失败: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def _remember(self, url, data):
+        """把封面放入内存缓存，超出数量时丢弃最久未使用的"""
+        with self._lock:
+            self._memory[url] = data
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+
+# 全局共享的封面缓存实例
+thumbnail_cache = ThumbnailCache()
@@ -6,9 +6,11 @@ import json
 import re
 import threading
 import traceback
+import signal
 from typing import Union, Optional, Callable, Dict, Any
 import ffmpeg
 import tempfile
+from src.db.download_history import DownloadHistoryDB, get_db
 
 
 # 配置日志
@@ -98,6 +100,11 @@ def safe_str(obj: Any) -> str:
             return str(obj)
     return str(obj)
 
+# 只对NVENC编码器有效的参数，回退到软件编码器时需要去掉
+_NVENC_ONLY_KEYS = frozenset((
+    'preset', 'tune', 'rc', 'cq', 'gpu', 'multipass', 'spatial-aq', 'temporal-aq', 'rc-lookahead'
+))
+
 def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None, 
                         progress_callback: Optional[Callable[[int, str, Optional[subprocess.Popen]], bool]] = None,
                         options: Optional[Dict[str, Any]] = None) -> str:
@@ -126,16 +133,16 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
             progress_callback(0, "输入文件不存在", None)
         return input_file
     
-    # 明确声明一个全局标志来跟踪是否取消转换，避免不同函数间的状态同步问题
-    global_cancel_requested = False
+    # 取消事件在回调、进度监控和取消检查线程之间共享
+    cancel_requested = threading.Event()
+    # 取消或进程结束时唤醒取消检查线程
+    cancel_watch_wakeup = threading.Event()
     
     # 创建一个共享的进程引用
     ffmpeg_process = {'process': None}
         
     # 自定义回调处理器函数
     def handle_callback(percent, message, proc=None):
-        nonlocal global_cancel_requested
-        
         # 如果提供了进程，更新共享引用
         if proc:
             ffmpeg_process['process'] = proc
@@ -146,7 +153,8 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
             # 如果回调返回False，表示请求取消
             if result is False:
                 logger.info("收到来自UI的取消请求")
-                global_cancel_requested = True
+                cancel_requested.set()
+                cancel_watch_wakeup.set()
                 # 立即尝试终止进程
                 if ffmpeg_process['process'] and ffmpeg_process['process'].poll() is None:
                     try:
@@ -252,9 +260,8 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
             duration = 300.0
             bit_rate = 5000000
         
-        # 检测可用的编码器
-        encoders = detect_encoders()
-        video_codec = select_best_encoder(encoders)
+        # 调用方指定了编码器时（如回退到libx264）直接使用，否则检测可用的编码器
+        video_codec = (options or {}).get('c:v') or select_best_encoder(detect_encoders())
         logger.info(f"使用编码器: {video_codec}")
         
         # 确保输出目录存在
@@ -303,28 +310,9 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
         }
         
         # 设置视频编码器和参数
-        if video_codec == 'av1_nvenc':
-            # AV1 NVENC参数
-            output_kwargs.update({
-                'c:v': video_codec,
-                'preset': 'p7',
-                'rc': 'vbr',
-                'cq': 20,
-                'gpu': 0,
-                'spatial-aq': 1,
-                'tune': 'hq',
-            })
-        elif 'nvenc' in video_codec:
-            # 其他NVENC编码器参数
-            output_kwargs.update({
-                'c:v': video_codec,
-                'preset': 'p7',
-                'rc': 'vbr',
-                'cq': 20,
-                'spatial-aq': 1,
-                'temporal-aq': 1,
-                'gpu': 0,
-            })
+        if 'nvenc' in video_codec:
+            # NVENC参数按GPU架构生成
+            output_kwargs.update(build_nvenc_options(video_codec, gpu_compute_capability()))
         else:
             # 软件编码器参数
             output_kwargs.update({
@@ -354,7 +342,7 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
                 'c:v', 'c:a', 'b:v', 'b:a', 'preset', 'crf', 'maxrate', 
                 'bufsize', 'f', 'movflags', 'rc', 'cq', 'gpu', 'spatial-aq', 
                 'temporal-aq', 'tune', 'profile:v', 'level', 'g', 'bf', 
-                'refs', 'rc-lookahead', 'me', 'subq', 'trellis'
+                'refs', 'rc-lookahead', 'me', 'subq', 'trellis', 'multipass'
             }
             # 只添加支持的选项
             filtered_options = {k: v for k, v in options.items() if k in supported_keys}
@@ -363,7 +351,7 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
         # 移除不支持的参数
         for key in list(output_kwargs.keys()):
             if key in ['fallback_codecs', 'video_codec', 'aq-strength', 'lookahead_level', 
-                      'keep_source_bitrate', 'tf_level', 'multipass', 'rc-lookahead']:
+                      'keep_source_bitrate', 'tf_level', 'rc-lookahead']:
                 output_kwargs.pop(key, None)
         
         # 创建输出流
@@ -376,15 +364,10 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
                     
             # 启动进度监控线程
             if progress_callback:
-                # 创建一个进程终止标志
-                terminate_requested = False
                 # 创建一个共享的进程引用变量
                 process_ref = {'process': None}
                 
                 def monitor_progress():
-                    # 获取外部作用域的变量
-                    nonlocal terminate_requested
-                    
                     # 等待一小段时间，确保日志文件已经创建
                     time.sleep(0.5)
                     
@@ -397,7 +380,7 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
                             
                             while True:
                                 # 检查是否已经请求终止
-                                if terminate_requested:
+                                if cancel_requested.is_set():
                                     logger.info("检测到终止标志，停止监控进度")
                                     break
                                     
@@ -484,7 +467,9 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
                     universal_newlines=True,
                     encoding='utf-8',
                     errors='replace',
-                    creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+                    # 以独立进程组启动，取消时可直接结束整个进程组
+                    creationflags=(subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP) if os.name == 'nt' else 0,
+                    start_new_session=os.name != 'nt'
                 )
                 
                 # 更新进程引用
@@ -498,28 +483,27 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
                 log_handler.daemon = True
                 log_handler.start()
                 
-                # 添加一个检查取消的线程
+                # 添加一个检查取消的线程，阻塞等待唤醒而不是轮询
                 def check_cancellation():
-                    while process and process.poll() is None:
-                        if global_cancel_requested or terminate_requested:
-                            logger.info("检测到终止请求，正在强制终止ffmpeg进程")
-                            try:
-                                terminate_process(process)
-                                logger.info("ffmpeg进程已被强制终止")
-                                break
-                            except Exception as e:
-                                logger.error(f"终止进程失败: {safe_str(e)}")
-                        time.sleep(0.3)
+                    cancel_watch_wakeup.wait()
+                    if cancel_requested.is_set() and process.poll() is None:
+                        logger.info("检测到终止请求，正在强制终止ffmpeg进程")
+                        try:
+                            terminate_process(process)
+                            logger.info("ffmpeg进程已被强制终止")
+                        except Exception as e:
+                            logger.error(f"终止进程失败: {safe_str(e)}")
                 
                 cancel_checker = threading.Thread(target=check_cancellation)
                 cancel_checker.daemon = True
                 cancel_checker.start()
                 
-                # 等待进程完成
+                # 等待进程完成，然后唤醒取消检查线程使其退出
                 return_code = process.wait()
+                cancel_watch_wakeup.set()
                 
                 # 如果请求取消，直接返回原始文件
-                if global_cancel_requested or terminate_requested:
+                if cancel_requested.is_set():
                     logger.info("转换过程被用户取消")
                     return input_file
                     
@@ -549,8 +533,8 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
                     if video_codec != 'libx264':
                         logger.info(f"尝试使用备用编码器 libx264")
                         
-                        # 创建新的options字典，只更改编码器
-                        fallback_options = options.copy() if options else {}
+                        # 改用libx264，去掉只对NVENC有效的参数
+                        fallback_options = {k: v for k, v in (options or {}).items() if k not in _NVENC_ONLY_KEYS}
                         fallback_options['c:v'] = 'libx264'
                         
                         return convert_webm_to_mp4(
@@ -573,8 +557,8 @@ def convert_webm_to_mp4(input_file: str, output_file: Optional[str] = None,
                 if video_codec != 'libx264':
                     logger.info(f"尝试使用备用编码器 libx264")
                     
-                    # 创建新的options字典，只更改编码器
-                    fallback_options = options.copy() if options else {}
+                    # 改用libx264，去掉只对NVENC有效的参数
+                    fallback_options = {k: v for k, v in (options or {}).items() if k not in _NVENC_ONLY_KEYS}
                     fallback_options['c:v'] = 'libx264'
                     
                     return convert_webm_to_mp4(
@@ -614,8 +598,101 @@ def handle_ffmpeg_output(process, log_path):
         logger.error(f"处理ffmpeg输出时发生错误: {safe_str(e)}")
         logger.error(traceback.format_exc())
 
-def detect_encoders() -> Dict[str, bool]:
-    """检测系统中可用的编码器"""
+# 编码器检测结果在进程内缓存，避免每次转换都启动ffmpeg和nvidia-smi
+_encoder_cache: Optional[Dict[str, bool]] = None
+_encoder_cache_lock = threading.Lock()
+
+# 第一块GPU的计算能力（例如Ada为8.9，Blackwell为12.0），检测编码器时一并获取，未知时为None
+_gpu_compute_cap: Optional[float] = None
+
+# AV1硬件编码需要Ada Lovelace及以上架构
+AV1_NVENC_MIN_COMPUTE_CAP = 8.9
+# Blackwell及以上架构的AV1/HEVC支持tune=uhq
+UHQ_MIN_COMPUTE_CAP = 10.0
+
+def detect_encoders(refresh: bool = False) -> Dict[str, bool]:
+    """
+    检测系统中可用的编码器，首次检测后结果会被缓存
+    
+    Args:
+        refresh: 是否忽略缓存重新检测
+        
+    Returns:
+        编码器名称到是否可用的映射（副本，可自由修改）
+    """
+    global _encoder_cache
+    with _encoder_cache_lock:
+        if _encoder_cache is None or refresh:
+            _encoder_cache = _probe_encoders()
+        return dict(_encoder_cache)
+
+def gpu_compute_capability() -> Optional[float]:
+    """
+    获取第一块NVIDIA GPU的计算能力，结果随编码器检测一起缓存
+    
+    Returns:
+        计算能力（如8.9），没有GPU或驱动不支持查询时返回None
+    """
+    detect_encoders()
+    return _gpu_compute_cap
+
+def _query_compute_cap() -> Optional[float]:
+    """通过nvidia-smi查询第一块GPU的计算能力，查询失败时返回None"""
+    try:
+        result = subprocess.run(
+            ['nvidia-smi', '--query-gpu=compute_cap', '--format=csv,noheader'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            return float(result.stdout.splitlines()[0].strip())
+    except (OSError, ValueError):
+        pass
+    return None
+
+def build_nvenc_options(video_codec: str, compute_cap: Optional[float] = None) -> Dict[str, Any]:
+    """
+    按GPU架构生成NVENC编码参数
+    
+    Blackwell上的AV1/HEVC使用tune=uhq，它已隐含前瞻、时域滤波和自适应量化等设置，
+    不再重复指定；其它架构使用tune=hq加全分辨率两遍编码。
+    
+    Args:
+        video_codec: NVENC编码器名称
+        compute_cap: GPU计算能力，未知时为None
+        
+    Returns:
+        ffmpeg输出参数
+    """
+    output_kwargs = {
+        'c:v': video_codec,
+        'preset': 'p7',
+        'rc': 'vbr',
+        'cq': 20,
+        'gpu': 0,
+    }
+    
+    if (compute_cap is not None and compute_cap >= UHQ_MIN_COMPUTE_CAP
+            and video_codec in ('av1_nvenc', 'hevc_nvenc')):
+        output_kwargs['tune'] = 'uhq'
+    else:
+        output_kwargs.update({
+            'tune': 'hq',
+            'multipass': 'fullres',
+            'spatial-aq': 1,
+        })
+        if video_codec != 'av1_nvenc':
+            output_kwargs['temporal-aq'] = 1
+    
+    return output_kwargs
+
+def _probe_encoders() -> Dict[str, bool]:
+    """运行ffmpeg -encoders和nvidia-smi检测系统中可用的编码器"""
+    global _gpu_compute_cap
+    _gpu_compute_cap = None
+    
     encoders = {
         'av1_nvenc': False,
         'hevc_nvenc': False,
@@ -646,14 +723,22 @@ def detect_encoders() -> Dict[str, bool]:
         # 额外检查NVIDIA硬件
         if any(encoder for encoder, available in encoders.items() if 'nvenc' in encoder and available):
             try:
-                nvidia_check = subprocess.run(
-                    ['nvidia-smi'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-                )
-                if nvidia_check.returncode != 0:
+                # 查询计算能力的同时确认驱动可用，旧驱动不支持该查询时再直接运行nvidia-smi
+                _gpu_compute_cap = _query_compute_cap()
+                if _gpu_compute_cap is not None:
+                    returncode = 0
+                    # 旧架构上ffmpeg虽然列出av1_nvenc，但初始化编码器必定失败
+                    if _gpu_compute_cap < AV1_NVENC_MIN_COMPUTE_CAP:
+                        encoders['av1_nvenc'] = False
+                else:
+                    returncode = subprocess.run(
+                        ['nvidia-smi'],
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+                    ).returncode
+                if returncode != 0:
                     # nvidia-smi失败，禁用所有NVENC编码器
                     for encoder in encoders.keys():
                         if 'nvenc' in encoder:
@@ -675,8 +760,8 @@ def detect_encoders() -> Dict[str, bool]:
 
 def select_best_encoder(encoders: Dict[str, bool]) -> str:
     """选择最佳可用编码器"""
-    # 按优先级尝试编码器，优先使用AV1
-    preferred_order = ['av1_nvenc', 'libaom-av1', 'hevc_nvenc', 'h264_nvenc', 'libx264']
+    # 按优先级尝试编码器，优先使用硬件编码，其中优先AV1
+    preferred_order = ['av1_nvenc', 'hevc_nvenc', 'h264_nvenc', 'libaom-av1', 'libx264']
     
     for encoder in preferred_order:
         if encoders.get(encoder, False):
@@ -685,60 +770,74 @@ def select_best_encoder(encoders: Dict[str, bool]) -> str:
     # 如果没有可用的编码器，默认返回libx264
     return 'libx264'
 
-def terminate_process(process):
+def terminate_process(process, grace_period=0.5):
     """
     强制终止进程的通用方法
+    
+    进程应以独立进程组启动（POSIX下start_new_session=True，Windows下
+    CREATE_NEW_PROCESS_GROUP），这样可以直接向进程发送信号而无需借助shell命令。
+    Windows下ffmpeg以CREATE_NO_WINDOW启动，没有控制台，收不到CTRL_BREAK_EVENT，
+    因此直接结束进程。
+    
+    Args:
+        process: 要终止的subprocess.Popen对象
+        grace_period: 等待进程退出的宽限时间（秒）
     """
     if not process or process.poll() is not None:
         return
 
+    pid = process.pid
     try:
-        pid = process.pid
         logger.info(f"终止进程 PID:{pid}")
         
         if os.name == 'nt':
-            # Windows系统使用taskkill命令，强制终止进程及其子进程
-            subprocess.call(
-                ['taskkill', '/F', '/T', '/PID', str(pid)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            
-            # 如果进程仍在运行，使用更强的方法
-            if process.poll() is None:
-                time.sleep(0.5)
-                os.system(f'TASKKILL /F /PID {pid} /T')
+            # 进程没有控制台，无法发送控制台信号让其自行退出，直接强制结束
+            try:
+                process.kill()
+            except OSError:
+                pass
+            try:
+                process.wait(timeout=grace_period)
+            except subprocess.TimeoutExpired:
+                # 仅在进程仍未退出时使用taskkill结束整个进程树，不等待taskkill本身
+                subprocess.Popen(
+                    ['taskkill', '/F', '/T', '/PID', str(pid)],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    creationflags=subprocess.CREATE_NO_WINDOW
+                )
+                try:
+                    process.wait(timeout=grace_period)
+                except subprocess.TimeoutExpired:
+                    pass
         else:
             # Unix系统先尝试正常终止
             process.terminate()
-            time.sleep(0.3)
-            
-            # 如果进程仍在运行，使用SIGKILL信号强制终止
-            if process.poll() is None:
-                process.kill()
-                time.sleep(0.2)
-                
-                # 如果仍然没有终止，尝试使用系统kill命令
-                if process.poll() is None:
-                    os.system(f'kill -9 {pid}')
+            try:
+                process.wait(timeout=grace_period)
+            except subprocess.TimeoutExpired:
+                # 宽限期后向整个进程组发送SIGKILL
+                try:
+                    os.killpg(os.getpgid(pid), signal.SIGKILL)
+                    process.wait(timeout=grace_period)
+                except (ProcessLookupError, subprocess.TimeoutExpired):
+                    pass
                     
-        # 确认进程已终止
-        time.sleep(0.2)
         if process.poll() is None:
             logger.warning(f"进程 {pid} 可能仍在运行")
         else:
             logger.info(f"进程 {pid} 已成功终止")
             
     except Exception as e:
-        logger.error(f"终止进程 {process.pid} 时出错: {str(e)}")
+        logger.error(f"终止进程 {pid} 时出错: {str(e)}")
         logger.error(traceback.format_exc())
 
 def convert_video(
     file_path: str,
     record_id: Optional[int] = None,
     progress_callback: Optional[Callable[[int, str], bool]] = None,
-    finished_callback: Optional[Callable[[bool, str, str], None]] = None
+    finished_callback: Optional[Callable[[bool, str, str], None]] = None,
+    db: Optional[DownloadHistoryDB] = None
 ) -> None:
     """
     执行视频格式转换的完整流程，包括转换、数据库更新和原始文件删除
@@ -748,6 +847,7 @@ def convert_video(
         record_id: 数据库记录ID，用于更新状态
         progress_callback: 进度更新回调函数
         finished_callback: 转换完成后的回调函数
+        db: 用于更新状态的数据库实例，为None时使用当前线程缓存的实例
     """
     logger.info(f"开始视频转换流程，文件: {file_path}, 记录ID: {record_id}")
     
@@ -767,25 +867,13 @@ def convert_video(
             finished_callback(True, "文件已经是MP4格式，无需转换", file_path)
         return
     
-    # 设置默认转换选项
-    convert_options = {
-        'video_codec': 'av1_nvenc',   # 使用NVIDIA GPU加速AV1编码器
-        'preset': 'p7',               # 最高质量预设
-        'tune': 'uhq',                # 超高质量调优
-        'rc': 'vbr',                  # 使用可变比特率模式
-        'cq': 20,                     # AV1的VBR质量值(0-63，值越低质量越高)
-        'audio_bitrate': '320k',      # 音频比特率
-        'keep_source_bitrate': True,  # 保持原视频比特率
-        'multipass': 'qres',          # 两通道编码，第一通道使用四分之一分辨率
-        'rc-lookahead': 32,           # 前瞻帧数，提高编码质量
-        'spatial-aq': True,           # 空间自适应量化，提高视觉质量
-        'temporal-aq': True,          # 时间自适应量化，提高动态场景质量
-        'aq-strength': 8,             # AQ强度(1-15)
-        'tf_level': 0,                # 时间滤波级别
-        'lookahead_level': 3,         # 前瞻级别
-        'fallback_codecs': ['h264_nvenc', 'hevc_nvenc', 'libx264'],  # 备用编码器列表
-        'gpu': 0                      # 固定使用GPU 0
-    }
+    # 整个转换流程共用同一个数据库实例
+    if db is None:
+        db = get_db()
+    
+    # 编码器及其调优参数由build_nvenc_options按检测到的GPU架构选择，
+    # 这里不再固定uhq/multipass等仅部分编码器支持的参数
+    convert_options = None
     
     # 生成目标文件路径
     target_file = file_path.replace(ext, '.mp4')
@@ -862,8 +950,6 @@ def convert_video(
             # 更新数据库状态
             if record_id:
                 try:
-                    from src.db.download_history import DownloadHistoryDB
-                    db = DownloadHistoryDB()
                     db.update_conversion_status(
                         file_path=file_path,
                         status="转换中断",
@@ -893,8 +979,6 @@ def convert_video(
             # 更新数据库
             if record_id:
                 try:
-                    from src.db.download_history import DownloadHistoryDB
-                    db = DownloadHistoryDB()
                     db.update_conversion_status(
                         file_path=output_file,
                         status="完成",
@@ -953,7 +1037,6 @@ def convert_video(
                     logger.debug("未找到有refresh_download_history方法的窗口对象，这是正常情况")
             except Exception as e:
                 logger.warning(f"尝试刷新下载历史时出错: {str(e)}")
-                import traceback
                 logger.debug(traceback.format_exc())
             
             return output_file
@@ -964,8 +1047,6 @@ def convert_video(
             # 更新数据库状态
             if record_id:
                 try:
-                    from src.db.download_history import DownloadHistoryDB
-                    db = DownloadHistoryDB()
                     db.update_conversion_status(
                         file_path=file_path,
                         status="转换中断",
@@ -989,8 +1070,6 @@ def convert_video(
         # 更新数据库状态
         if record_id:
             try:
-                from src.db.download_history import DownloadHistoryDB
-                db = DownloadHistoryDB()
                 db.update_conversion_status(
                     file_path=file_path,
                     status="转换中断",
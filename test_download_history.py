@@ -0,0 +1,34 @@
+import os
+
+from src.db.download_history import DownloadHistoryDB
+
+
+def _converted_record(tmp_path, status):
+    """模拟一次webm转mp4：写入下载记录并生成mp4文件后更新转换状态"""
+    db = DownloadHistoryDB(str(tmp_path / "history.db"))
+    webm_path = str(tmp_path / "video.webm")
+    mp4_path = str(tmp_path / "video.mp4")
+    
+    record_id = db.add_download("vid", "标题", "https://example.com/watch?v=vid", output_path=webm_path)
+    db.update_download_status(record_id, "完成", output_path=webm_path, file_size=1)
+    
+    with open(mp4_path, "wb") as f:
+        f.write(b"\0" * 1234)
+    
+    assert db.update_conversion_status(mp4_path, status, record_id=record_id)
+    return db.get_downloads()[0]
+
+
+def test_conversion_points_record_at_mp4(tmp_path):
+    record = _converted_record(tmp_path, "完成")
+    assert record["status"] == "完成"
+    assert record["output_path"].endswith(".mp4")
+    assert record["file_size"] == 1234
+
+
+def test_conversion_dialog_status_is_stored_as_complete(tmp_path):
+    # 历史页面的转换对话框曾写入"转换完成"，同样要更新为mp4路径
+    record = _converted_record(tmp_path, "转换完成")
+    assert record["status"] == "完成"
+    assert record["output_path"] == os.path.join(str(tmp_path), "video.mp4")
+    assert record["file_size"] == 1234